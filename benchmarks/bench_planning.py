@@ -0,0 +1,125 @@
+"""
+Planning and build benchmarks over synthetic workstation graphs (see benchmarks/graphs.py).
+
+Run as a regression check from the repository root:
+
+    python -m pytest benchmarks/bench_planning.py
+
+or print timings:
+
+    python benchmarks/bench_planning.py
+
+Each stage of operate_workstation_graph (1: depth, 2: engage, 3: build), as well as
+get_requirements() over a fresh graph, combine_reqs() over all tool requirements and a dry-run
+plan, is timed separately at a small and a 4x larger graph. A benchmark fails if a stage grows
+more than SCALING_TOLERANCE times faster than the graph, or costs more than
+MAX_SECONDS_PER_STATION.
+Tools and options per workstation can be set with FACTORY_BENCH_TOOLS and
+FACTORY_BENCH_OPTIONS.
+"""
+import gc
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from factory.factory import build_graph_depth, engage_workstation_graph, build_workstation_graph
+from factory.factory import combine_reqs
+from factory.plan import dry_run_workstation_graph
+from graphs import chain_graph, fan_out_graph, diamond_graph, random_dag_graph, tree_graph
+
+TOOLS = int(os.environ.get('FACTORY_BENCH_TOOLS', 2))
+OPTIONS = int(os.environ.get('FACTORY_BENCH_OPTIONS', 2))
+REPEATS = 3
+SCALING = 4
+SCALING_TOLERANCE = 2.5
+MAX_SECONDS_PER_STATION = 1e-3
+MIN_SECONDS = 1e-3  # stages faster than this are too noisy to compare
+
+# (name, generator, small size argument, large size argument, extra arguments)
+GRAPHS = [
+    ('chain', chain_graph, 100, 100 * SCALING, {}),
+    ('fan_out', fan_out_graph, 250, 250 * SCALING, {}),
+    ('diamond', diamond_graph, 50, 50 * SCALING, {'width': 2}),
+    ('random_dag', random_dag_graph, 10, 10 * SCALING, {'width': 40, 'degree': 3}),
+    ('tree', tree_graph, 9, 11, {}),
+]
+STAGES = ['stage_1', 'stage_2', 'stage_3', 'get_requirements', 'combine_reqs', 'dry_run']
+
+
+def time_stages(generator, size, **kwargs) -> (dict, int):
+    """
+    Time each stage over a fresh graph, returning the fastest of REPEATS runs. As with timeit,
+    garbage collection is disabled while timing.
+    :return: (dict of seconds per stage, number of workstations)
+    """
+    best = {stage: float('inf') for stage in STAGES}
+    for _ in range(REPEATS):
+        times = {}
+        start, stations = generator(size, tools=TOOLS, options=OPTIONS, **kwargs)
+        gc.collect()
+        gc.disable()
+
+        tic = time.perf_counter()
+        dry_run_workstation_graph(start)
+        times['dry_run'] = time.perf_counter() - tic
+
+        tic = time.perf_counter()
+        for station in reversed(stations):
+            station.get_requirements()
+        times['get_requirements'] = time.perf_counter() - tic
+        start.invalidate_requirements()
+
+        tic = time.perf_counter()
+        build_graph_depth(start)
+        times['stage_1'] = time.perf_counter() - tic
+
+        tic = time.perf_counter()
+        sequence = engage_workstation_graph(start)
+        times['stage_2'] = time.perf_counter() - tic
+
+        tic = time.perf_counter()
+        build_workstation_graph(sequence)
+        times['stage_3'] = time.perf_counter() - tic
+
+        reqs = [tool.get_requirements() for s in stations for tool in s.resources.values()]
+        tic = time.perf_counter()
+        combine_reqs(reqs)
+        times['combine_reqs'] = time.perf_counter() - tic
+        gc.enable()
+
+        for stage, seconds in times.items():
+            best[stage] = min(best[stage], seconds)
+    return best, len(stations) + 1
+
+
+@pytest.mark.parametrize(
+    "generator,small,large,kwargs", [graph[1:] for graph in GRAPHS], ids=[g[0] for g in GRAPHS]
+)
+def test_scaling(generator, small, large, kwargs):
+    small_times, small_size = time_stages(generator, small, **kwargs)
+    large_times, large_size = time_stages(generator, large, **kwargs)
+    growth = large_size / small_size
+
+    failures = []
+    for stage in STAGES:
+        ratio = large_times[stage] / max(small_times[stage], MIN_SECONDS)
+        if ratio > growth * SCALING_TOLERANCE:
+            failures.append(f'{stage} grew {ratio:.1f}x for {growth:.1f}x workstations')
+        if large_times[stage] > MAX_SECONDS_PER_STATION * large_size:
+            failures.append(f'{stage} took {large_times[stage]:.3f}s for {large_size} stations')
+    assert not failures, failures
+
+
+def main():
+    print(f'{"graph":>12} {"stations":>9} ' + ' '.join(f'{stage:>17}' for stage in STAGES))
+    for name, generator, small, large, kwargs in GRAPHS:
+        for size in (small, large):
+            times, stations = time_stages(generator, size, **kwargs)
+            print(f'{name:>12} {stations:>9} ' + ' '.join(f'{times[s]:>17.5f}' for s in STAGES))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+Synthetic workstation graph generators for benchmarks.
+
+Each generator returns the starting workstation and the list of all other workstations. Every
+workstation holds `tools` tools, and tool j at a workstation requires tool j from each of its
+suppliers, passing its option on, so that every tool is required for every one of `options`
+options.
+"""
+import random
+
+from factory.factory import WorkStation, Tool
+
+
+class Config:
+    def __init__(self, requirements: dict):
+        self.requirements = requirements
+
+    def get_requirements(self):
+        return self.requirements
+
+
+class StartProcess(WorkStation):
+    tools = None
+
+
+class Process(WorkStation):
+    tools = {}
+
+
+class SyntheticTool(Tool):
+
+    def build(self, resource):
+        pass
+
+
+def make_graph(suppliers: dict, tools=1, options=1) -> (WorkStation, list):
+    """
+    Make workstation graph from supplier adjacency.
+    :param suppliers: dict, {node: [supplier nodes]} for nodes 0..n-1
+    :param tools: int, number of tools per workstation
+    :param options: int, number of options per tool
+    :return: (starting workstation, list of workstations)
+    """
+    option_names = [f'o{k}' for k in range(options)]
+    managers = {node: [] for node in suppliers}
+    for node, node_suppliers in suppliers.items():
+        for supplier in node_suppliers:
+            managers[supplier].append(node)
+    roots = [node for node, node_managers in managers.items() if not node_managers]
+
+    config = Config({f't{root}_{j}': option_names for root in roots for j in range(tools)})
+    start = StartProcess(config)
+    stations = {node: Process(config) for node in suppliers}
+    for node, station in stations.items():
+        station.tools = {
+            f't{node}_{j}': type(f'Tool{node}_{j}', (SyntheticTool,), {
+                'req': [f't{supplier}_{j}' for supplier in suppliers[node]] or None,
+                'valid_options': option_names,
+            })
+            for j in range(tools)
+        }
+        station.connect(
+            [stations[m] for m in managers[node]] or [start],
+            [stations[s] for s in suppliers[node]] or None,
+        )
+    start.connect(None, [stations[root] for root in roots])
+    return start, list(stations.values())
+
+
+def chain_graph(n: int, **kwargs) -> (WorkStation, list):
+    """
+    Chain of n workstations, each supplied by the next.
+    """
+    return make_graph({i: [i + 1] if i + 1 < n else [] for i in range(n)}, **kwargs)
+
+
+def fan_out_graph(n: int, **kwargs) -> (WorkStation, list):
+    """
+    One workstation supplied by n - 2 independent workstations, all supplied by one source.
+    """
+    source = n - 1
+    suppliers = {0: list(range(1, source)), source: []}
+    suppliers.update({i: [source] for i in range(1, source)})
+    return make_graph(suppliers, **kwargs)
+
+
+def diamond_graph(layers: int, width=2, **kwargs) -> (WorkStation, list):
+    """
+    Lattice of diamonds: a single workstation per layer supplied through `width` parallel
+    workstations by the single workstation of the next layer.
+    """
+    suppliers = {}
+    for layer in range(layers):
+        top = layer * (width + 1)
+        bottom = top + width + 1
+        suppliers[top] = list(range(top + 1, bottom))
+        for i in range(top + 1, bottom):
+            suppliers[i] = [bottom]
+    suppliers[layers * (width + 1)] = []
+    return make_graph(suppliers, **kwargs)
+
+
+def random_dag_graph(layers: int, width: int, degree=2, seed=0, **kwargs) -> (WorkStation, list):
+    """
+    Layered random DAG, each workstation supplied by up to `degree` random workstations of the
+    next layer.
+    """
+    rng = random.Random(seed)
+    suppliers = {}
+    for layer in range(layers):
+        for i in range(width):
+            node = layer * width + i
+            if layer + 1 == layers:
+                suppliers[node] = []
+                continue
+            below = range((layer + 1) * width, (layer + 2) * width)
+            suppliers[node] = sorted(rng.sample(below, min(degree, width)))
+    return make_graph(suppliers, **kwargs)
+
+
+def tree_graph(depth: int, **kwargs) -> (WorkStation, list):
+    """
+    Binary tree of workstations, with all leaves supplied by one source workstation.
+    """
+    size = 2 ** depth - 1
+    first_leaf = 2 ** (depth - 1) - 1
+    suppliers = {i: [2 * i + 1, 2 * i + 2] for i in range(first_leaf)}
+    suppliers.update({i: [size] for i in range(first_leaf, size)})
+    suppliers[size] = []
+    return make_graph(suppliers, **kwargs)
@@ -0,0 +1,32 @@
+"""
+Benchmark of operate_workstation_graph scheduling over generated supplier graphs of increasing
+size. Run from the repository root:
+
+    python benchmarks/scheduler_benchmark.py
+
+Graphs are binary trees of workstations whose leaves share a single source workstation, so every
+workstation has bounded requirements and the source is reached once per leaf. Time per
+workstation should stay roughly flat as the graph grows.
+"""
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from factory.factory import operate_workstation_graph
+from graphs import tree_graph
+
+
+def main(depths=range(8, 15)):
+    print(f'{"stations":>10} {"seconds":>10} {"us/station":>12}')
+    for depth in depths:
+        start, stations = tree_graph(depth)
+        size = len(stations) + 1
+        tic = time.perf_counter()
+        operate_workstation_graph(start)
+        elapsed = time.perf_counter() - tic
+        print(f'{size:>10} {elapsed:>10.4f} {1e6 * elapsed / size:>12.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,236 @@
+from collections import deque
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+
+from factory.factory import StreamTool, Tool, convert_to_unique_keys
+
+try:
+    import numpy as np
+except ImportError:  # optional, columns are lists without numpy
+    np = None
+
+
+def to_columns(records: list, fields=None) -> dict:
+    """
+    Convert a list of records (dicts, or tuples in order of fields) to a columnar batch
+    {field: column}, with numpy array columns if numpy is available, else lists.
+    :param records: list, of records
+    :param fields: optional list, of field names, required for tuple records
+    :return: dict
+    """
+    if not records:
+        return {field: _column([]) for field in fields or []}
+    if isinstance(records[0], Mapping):
+        fields = fields or list(records[0])
+        return {field: _column([record[field] for record in records]) for field in fields}
+    if fields is None:
+        raise ValueError('Fields are required for records that are not mappings.')
+    return {field: _column(list(values)) for field, values in zip(fields, zip(*records))}
+
+
+def _column(values: list):
+    return np.asarray(values) if np is not None else values
+
+
+def batch_length(batch: Mapping) -> int:
+    """
+    Return number of records in a columnar batch.
+    :param batch: dict, {field: column}
+    :return: int
+    """
+    return len(next(iter(batch.values()))) if batch else 0
+
+
+def is_batchable(resource) -> bool:
+    """
+    Return True if resource can be read as columnar batches (see iter_batches()).
+    :param resource: resource
+    :return: bool
+    """
+    return hasattr(resource, 'batches') or hasattr(resource, 'columns') or \
+        isinstance(resource, StreamTool)
+
+
+def iter_batches(resource, chunk_size: int):
+    """
+    Yield columnar batches {field: column} of at most chunk_size records from a resource.
+
+    Resources may define batches(chunk_size) to yield their own batches, or hold a .columns
+    dict of equal length columns (eg numpy arrays) to be sliced without copying. Otherwise
+    records of a StreamTool are collected into batches with to_columns().
+    :param resource: resource
+    :param chunk_size: int, maximum records per batch
+    :return: iterator, of dicts
+    """
+    if hasattr(resource, 'batches'):
+        yield from resource.batches(chunk_size)
+    elif hasattr(resource, 'columns'):
+        columns = resource.columns
+        for start in range(0, batch_length(columns), chunk_size):
+            yield {field: column[start:start + chunk_size] for field, column in columns.items()}
+    elif isinstance(resource, StreamTool):
+        fields = resource.fields
+        records = []
+        for record in resource.stream():
+            records.append(record)
+            if len(records) == chunk_size:
+                yield to_columns(records, fields)
+                records = []
+        if records:
+            yield to_columns(records, fields)
+    else:
+        raise TypeError(f'Resource cannot be batched: {resource}')
+
+
+def reduce_batches(tool: 'BatchTool', batches, workers=None):
+    """
+    Reduce batches into a single accumulator of a batch tool. With workers, batches are reduced
+    into partial accumulators in a thread pool (vectorized numpy operations release the GIL),
+    then merged in order. At most 2 * workers batches are in flight at once.
+    :param tool: BatchTool
+    :param batches: iterable, of columnar batches
+    :param workers: optional int, number of threads
+    :return: accumulator
+    """
+    accumulator = tool.accumulator()
+    if not workers:
+        for batch in batches:
+            accumulator = tool.reduce(accumulator, batch)
+        return accumulator
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = deque()
+        for batch in batches:
+            futures.append(pool.submit(tool.reduce, tool.accumulator(), batch))
+            if len(futures) >= 2 * workers:
+                accumulator = tool.merge(accumulator, futures.popleft().result())
+        while futures:
+            accumulator = tool.merge(accumulator, futures.popleft().result())
+    return accumulator
+
+
+class BatchTool(Tool):
+    """
+    Base tool for vectorized reductions over batched requirements, such as counting events.
+
+    Rather than handling records one by one, subclasses reduce fixed size columnar batches
+    {field: column} (numpy arrays if available) into an accumulator, and the framework handles
+    chunking of the supplier resources and merging of partial accumulators:
+
+        accumulator() -> new empty accumulator, eg np.zeros(n)
+        reduce(accumulator, batch) -> accumulator, eg updated with np.add.at()
+        merge(left, right) -> combined accumulator, defaults to left + right
+        finalize(accumulator, resource) -> sets the built result, defaults to .result
+
+    Batched requirements are given by tool name in .batch_requirements, or default to all
+    requirements with a batchable supplier resource (see is_batchable()). Set .chunk_workers to
+    reduce batches in a thread pool. At a StreamWorkStation, streamed records are consumed into
+    batches during the shared pass instead.
+    """
+    batch_requirements = None
+    chunk_size = 2 ** 16
+    chunk_workers = None
+
+    def __init__(self, option=None):
+        super().__init__(option)
+        self._accumulator = None
+        self._records = {}
+        self._fields = {}
+        self._streamed = set()
+
+    def accumulator(self):
+        """
+        Return a new empty accumulator.
+        :return: accumulator
+        """
+        raise NotImplementedError(f'Accumulator not implemented at tool: {self}')
+
+    def reduce(self, accumulator, batch: dict):
+        """
+        Reduce a columnar batch into an accumulator.
+        :param accumulator: accumulator
+        :param batch: dict, {field: column}
+        :return: accumulator
+        """
+        raise NotImplementedError(f'Reduce not implemented at tool: {self}')
+
+    def merge(self, left, right):
+        """
+        Merge two partial accumulators, in order.
+        :param left: accumulator
+        :param right: accumulator
+        :return: accumulator
+        """
+        return left + right
+
+    def finalize(self, accumulator, resource: Mapping) -> None:
+        """
+        Set built result from the final accumulator.
+        :param accumulator: accumulator
+        :param resource: mapping, of supplier resources
+        :return: None
+        """
+        self.result = accumulator
+
+    def prepare_consume(self, requirement: str, source: StreamTool) -> None:
+        """
+        Record the .fields of a streamed requirement, to batch its records.
+        :param requirement: str, unique key of streamed requirement
+        :param source: StreamTool, streamed supplier resource
+        :return: None
+        """
+        self._fields[requirement] = source.fields
+
+    def consume(self, requirement: str, record) -> None:
+        """
+        Collect streamed records (mappings) into batches of .chunk_size, reducing each full
+        batch.
+        :param requirement: str, unique key of streamed requirement
+        :param record: record
+        :return: None
+        """
+        self._streamed.add(requirement)
+        if self._accumulator is None:
+            self._accumulator = self.accumulator()
+        records = self._records.setdefault(requirement, [])
+        records.append(record)
+        if len(records) == self.chunk_size:
+            self._reduce_consumed(requirement)
+
+    def _reduce_consumed(self, requirement: str) -> None:
+        records = self._records.pop(requirement)
+        columns = to_columns(records, self._fields.get(requirement))
+        self._accumulator = self.reduce(self._accumulator, columns)
+
+    def build(self, resource: Mapping) -> None:
+        """
+        Reduce all batched requirements not already consumed, then finalize.
+        :param resource: mapping, of supplier resources
+        :return: None
+        """
+        super().build(resource)
+        if self._accumulator is None:
+            self._accumulator = self.accumulator()
+        for requirement in list(self._records):
+            self._reduce_consumed(requirement)
+        accumulator, self._accumulator = self._accumulator, None
+        streamed, self._streamed = self._streamed, set()  # ie a rebuild reads all requirements
+        self._fields = {}
+
+        for requirement in self._batched(resource):
+            if requirement in streamed:
+                continue  # ie consumed during the workstation pass
+            batches = iter_batches(resource[requirement], self.chunk_size)
+            partial = reduce_batches(self, batches, workers=self.chunk_workers)
+            accumulator = self.merge(accumulator, partial)
+        self.finalize(accumulator, resource)
+
+    def _batched(self, resource: Mapping) -> list:
+        """
+        Return unique keys of batched requirements.
+        """
+        requirements = convert_to_unique_keys(self.get_requirements())
+        if self.batch_requirements is None:
+            return [r for r in requirements if r in resource and is_batchable(resource[r])]
+        names = set(self.batch_requirements)
+        return [r for r in requirements if r.split(':')[0] in names]
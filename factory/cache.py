@@ -0,0 +1,196 @@
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+from factory.factory import convert_to_unique_keys
+
+
+class ResourceCache:
+    """
+    Persistent on-disk cache of built resources, with size bounded least-recently-used eviction.
+
+    Resources are keyed by content: the tool class, its option, its resolved requirements and
+    the fingerprints of the supplier resources it requires. Built tools are given their key as
+    .fingerprint, so that a change anywhere upstream changes the keys of all downstream tools,
+    and only the affected subgraph is rebuilt.
+
+    Tools reading external inputs can define a cache_token() method, returning a value that
+    changes with those inputs (eg a file modification time), to be included in their key.
+    """
+
+    suffix = '.pkl'
+
+    def __init__(self, path: str, max_bytes=2 ** 30):
+        """
+        Initiate cache at given directory, indexing existing entries by last use.
+        :param path: str, cache directory (created if missing)
+        :param max_bytes: int, maximum total size of cache entries
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+        entries = []
+        for name in os.listdir(path):
+            if name.endswith(self.suffix):
+                stat = os.stat(os.path.join(path, name))
+                entries.append((stat.st_mtime, name[:-len(self.suffix)], stat.st_size))
+        self._index = OrderedDict((key, size) for _, key, size in sorted(entries))
+        self.size = sum(self._index.values())
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def key(self, tool, resources: dict):
+        """
+        Return cache key of tool given supplier resources, or None if a required supplier
+        resource cannot be fingerprinted.
+        :param tool: tool
+        :param resources: dict, of supplier resources
+        :return: str or None
+        """
+        requirements = sorted(convert_to_unique_keys(tool.get_requirements()))
+        tool_class = getattr(tool, 'tool_class', type(tool))  # ie LazyTool
+        parts = [f'{tool_class.__module__}.{tool_class.__qualname__}', repr(tool.option)]
+        if hasattr(tool_class, 'cache_token'):
+            if tool_class is not type(tool):  # ie token of an uninitiated tool for a LazyTool
+                option, tool = tool.option, tool_class.__new__(tool_class)
+                tool.option = option
+            parts.append(repr(tool.cache_token()))
+        for requirement in requirements:
+            fingerprint = self.fingerprint(resources.get(requirement))
+            if fingerprint is None:
+                return None
+            parts.append(f'{requirement}={fingerprint}')
+        return hashlib.sha256('\n'.join(parts).encode()).hexdigest()
+
+    @staticmethod
+    def fingerprint(resource):
+        """
+        Return fingerprint of a resource. Cached resources carry their key as .fingerprint,
+        otherwise the resource is hashed by value. Returns None if resource cannot be pickled.
+        :param resource: resource
+        :return: str or None
+        """
+        fingerprint = getattr(resource, 'fingerprint', None)
+        if fingerprint is not None:
+            return fingerprint
+        try:
+            return hashlib.sha256(pickle.dumps(resource)).hexdigest()
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return None
+
+    def restore(self, tools: dict, resources: dict, keys=None) -> list:
+        """
+        Replace tools with cached resources where available, marking all tools with their
+        .fingerprint.
+        :param tools: dict, of workstation resources {key: tool}
+        :param resources: dict, of supplier resources
+        :param keys: optional list, of keys of tools to restore, defaults to all
+        :return: list, of keys of tools still to be built
+        """
+        missing = []
+        for name in list(tools) if keys is None else keys:
+            tool = tools[name]
+            key = self.key(tool, resources)
+            cached = self.load(key) if key else None
+            if cached is None:
+                tool.fingerprint = key
+                missing.append(name)
+            else:
+                tools[name] = cached
+        return missing
+
+    def save(self, tools: dict, keys: list) -> None:
+        """
+        Store given built tools.
+        :param tools: dict, of workstation resources {key: tool}
+        :param keys: list, of keys of tools to store
+        :return: None
+        """
+        for name in keys:
+            tool = tools[name]
+            if getattr(tool, 'fingerprint', None):
+                self.store(tool.fingerprint, tool)
+
+    def load(self, key: str):
+        """
+        Load resource from cache, or return None if not cached.
+        :param key: str, cache key
+        :return: resource or None
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                resource = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            with self._lock:
+                self.misses += 1
+                self.size -= self._index.pop(key, 0)
+            return None
+        os.utime(path)
+        with self._lock:
+            self.hits += 1
+            size = self._index.pop(key, None)
+            if size is None:  # ie stored by another process
+                size = os.path.getsize(path)
+                self.size += size
+            self._index[key] = size
+        return resource
+
+    def store(self, key: str, resource) -> None:
+        """
+        Store resource in cache, then evict least recently used entries beyond .max_bytes.
+        Resources that cannot be pickled are not stored.
+        :param key: str, cache key
+        :param resource: resource
+        :return: None
+        """
+        try:
+            data = pickle.dumps(resource)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            return None
+        path = self._path(key)
+        temp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temp, 'wb') as f:
+            f.write(data)
+        os.replace(temp, path)
+
+        with self._lock:
+            self.size += len(data) - self._index.pop(key, 0)
+            self._index[key] = len(data)
+            while self.size > self.max_bytes and len(self._index) > 1:
+                evicted, evicted_size = self._index.popitem(last=False)
+                self.size -= evicted_size
+                try:
+                    os.remove(self._path(evicted))
+                except FileNotFoundError:
+                    pass
+
+    def clear(self) -> None:
+        """
+        Remove all cache entries.
+        :return: None
+        """
+        with self._lock:
+            for key in self._index:
+                try:
+                    os.remove(self._path(key))
+                except FileNotFoundError:
+                    pass
+            self._index.clear()
+            self.size = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.path, key + self.suffix)
@@ -0,0 +1,265 @@
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import uuid
+from array import array
+from collections.abc import Mapping, Sequence
+
+from factory.factory import Tool
+
+try:
+    import numpy as np
+except ImportError:  # optional, columns are memoryviews without numpy
+    np = None
+
+MAGIC = b'FCOL1\n'
+ALIGN = 64
+
+# schema dtypes and their struct format codes
+FORMATS = {
+    'i1': 'b', 'i2': 'h', 'i4': 'i', 'i8': 'q',
+    'u1': 'B', 'u2': 'H', 'u4': 'I', 'u8': 'Q',
+    'f4': 'f', 'f8': 'd', 'b1': '?',
+}
+DTYPES = {code: dtype for dtype, code in FORMATS.items()}
+
+
+def infer_dtype(column) -> str:
+    """
+    Return schema dtype of a column: a numpy array, a memoryview, a StringColumn or a sequence
+    of bool, int, float or str values. Raise TypeError if the column cannot be stored.
+    :param column: column
+    :return: str, dtype
+    """
+    if isinstance(column, StringColumn):
+        return 'str'
+    if isinstance(column, memoryview):
+        if column.format not in DTYPES:
+            raise TypeError(f'Unsupported column format: {column.format}')
+        return DTYPES[column.format]
+    if np is not None and isinstance(column, np.ndarray):
+        if column.dtype.kind in 'iuf':
+            return f'{column.dtype.kind}{column.dtype.itemsize}'
+        if column.dtype.kind == 'b':
+            return 'b1'
+        if column.dtype.kind in 'UO':
+            return 'str'
+        raise TypeError(f'Unsupported column dtype: {column.dtype}')
+
+    types = {type(value) for value in column}
+    if types <= {bool}:
+        return 'b1'
+    if types <= {int}:
+        return 'i8'
+    if types <= {int, float}:
+        return 'f8'
+    if types <= {str}:
+        return 'str'
+    raise TypeError(f'Unsupported column types: {types}')
+
+
+def write_columns(path: str, columns: dict, schema=None) -> dict:
+    """
+    Write equal length columns to a columnar file: a small JSON schema header followed by each
+    column as contiguous, aligned, native byte order values. String columns are written as int64
+    offsets and utf-8 data.
+    :param path: str, file path
+    :param columns: dict, {name: column}
+    :param schema: optional dict, {name: dtype}, inferred by default (see infer_dtype())
+    :return: dict, header
+    """
+    lengths = {len(column) for column in columns.values()}
+    if len(lengths) > 1:
+        raise ValueError(f'Columns have unequal lengths: {sorted(lengths)}')
+    schema = schema or {}
+
+    blobs = []
+    header = {'length': lengths.pop() if lengths else 0, 'byteorder': sys.byteorder, 'columns': []}
+    for name, column in columns.items():
+        dtype = schema.get(name) or infer_dtype(column)
+        entry = {'name': name, 'dtype': dtype}
+        if dtype == 'str':
+            data = [str(value).encode() for value in column]
+            offsets = [0]
+            for value in data:
+                offsets.append(offsets[-1] + len(value))
+            blobs.append(array('q', offsets).tobytes())
+            blobs.append(b''.join(data))
+        elif dtype in FORMATS:
+            blobs.append(_to_bytes(column, dtype))
+        else:
+            raise TypeError(f'Unsupported dtype: {dtype}')
+        header['columns'].append(entry)
+
+    # place blobs at aligned offsets after the header, growing the header until offsets fit
+    header_size = ALIGN
+    while True:
+        position = _align(len(MAGIC) + 8 + header_size)
+        blob_offsets = []
+        for blob in blobs:
+            blob_offsets.append((position, len(blob)))
+            position = _align(position + len(blob))
+        blob_iter = iter(blob_offsets)
+        for entry in header['columns']:
+            if entry['dtype'] == 'str':
+                entry['offsets'] = next(blob_iter)
+            entry['data'] = next(blob_iter)
+        encoded = json.dumps(header).encode()
+        if len(encoded) <= header_size:
+            break
+        header_size = _align(len(encoded))
+
+    encoded = encoded.ljust(header_size)
+    temp = f'{path}.{os.getpid()}.tmp'
+    with open(temp, 'wb') as f:
+        f.write(MAGIC + struct.pack('<Q', header_size) + encoded)
+        for blob, (offset, _) in zip(blobs, blob_offsets):
+            f.write(b'\0' * (offset - f.tell()))
+            f.write(blob)
+    os.replace(temp, path)
+    return header
+
+
+def _to_bytes(column, dtype: str) -> bytes:
+    if isinstance(column, memoryview):
+        return column.tobytes()
+    if np is not None:
+        return np.ascontiguousarray(column, dtype=f'={dtype}' if dtype != 'b1' else '?').tobytes()
+    if dtype == 'b1':
+        return bytes(bool(value) for value in column)
+    return array(FORMATS[dtype], column).tobytes()
+
+
+def _align(position: int) -> int:
+    return -(-position // ALIGN) * ALIGN
+
+
+class StringColumn(Sequence):
+    """
+    Read-only column of strings over int64 offsets and utf-8 data, decoded on access. Slices
+    are views sharing the same data.
+    """
+
+    def __init__(self, offsets: memoryview, data: memoryview):
+        """
+        :param offsets: memoryview, of len(column) + 1 int64 offsets into data
+        :param data: memoryview, of utf-8 bytes
+        """
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return StringColumn(self.offsets[start:max(start, stop) + 1], self.data)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return str(self.data[self.offsets[index]:self.offsets[index + 1]], 'utf-8')
+
+
+class ColumnarFile(Mapping):
+    """
+    Memory-mapped columnar file (see write_columns()), as a read-only mapping of column names to
+    zero-copy columns: numpy arrays if numpy is available, else typed memoryviews, and
+    StringColumns for strings.
+
+    Pickles as its path only, so that worker processes map the same file instead of receiving
+    a copy of the data.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: str, file path
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'Not a columnar file: {path}')
+        start = len(MAGIC) + 8
+        (header_size,) = struct.unpack('<Q', self._mmap[len(MAGIC):start])
+        self.header = json.loads(self._mmap[start:start + header_size])
+        if self.header['byteorder'] != sys.byteorder:
+            raise ValueError(f'Columnar file byte order is {self.header["byteorder"]}: {path}')
+        self.length = self.header['length']
+        self.schema = {entry['name']: entry['dtype'] for entry in self.header['columns']}
+        self._columns = {}
+
+    def __getstate__(self):
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'])
+
+    def __getitem__(self, name):
+        if name not in self._columns:
+            entry = next((e for e in self.header['columns'] if e['name'] == name), None)
+            if entry is None:
+                raise KeyError(name)
+            self._columns[name] = self._map(entry)
+        return self._columns[name]
+
+    def __iter__(self):
+        return iter(self.schema)
+
+    def __len__(self) -> int:
+        return len(self.schema)
+
+    def _map(self, entry: dict):
+        offset, size = entry['data']
+        view = memoryview(self._mmap)[offset:offset + size]
+        if entry['dtype'] == 'str':
+            offsets_offset, offsets_size = entry['offsets']
+            offsets = memoryview(self._mmap)[offsets_offset:offsets_offset + offsets_size]
+            return StringColumn(offsets.cast('q'), view)
+        if np is not None:
+            dtype = '?' if entry['dtype'] == 'b1' else f'={entry["dtype"]}'
+            return np.frombuffer(self._mmap, dtype=dtype, count=self.length, offset=offset)
+        return view.cast(FORMATS[entry['dtype']])
+
+
+class ColumnarTool(Tool):
+    """
+    Base tool for resources held in the columnar intermediate format. Build the columns, then
+    call save_columns() to write them to .columnar_dir and set .columns to the mapped file.
+
+    Downstream tools read .columns as zero-copy columns (and as batches, see factory.batch), and
+    the tool pickles with the file path only, so that it is mapped rather than copied when sent
+    to worker processes, a DirectoryBackend or a ResourceCache. Files are not removed
+    automatically, see discard().
+    """
+    columnar_dir = None
+
+    def save_columns(self, columns: dict, schema=None) -> ColumnarFile:
+        """
+        Write columns to a new columnar file and map them as .columns.
+        :param columns: dict, {name: column}
+        :param schema: optional dict, {name: dtype}
+        :return: ColumnarFile
+        """
+        directory = self.columnar_dir or os.path.join(tempfile.gettempdir(), 'factory-columnar')
+        os.makedirs(directory, exist_ok=True)
+        name = f'{type(self).__name__}-{self.option}-{uuid.uuid4().hex}.fcol'
+        path = os.path.join(directory, name)
+        write_columns(path, columns, schema)
+        self.columns = ColumnarFile(path)
+        return self.columns
+
+    def discard(self) -> None:
+        """
+        Remove the columnar file of the tool, if saved.
+        :return: None
+        """
+        columns = self.__dict__.pop('columns', None)
+        if columns is not None:
+            os.remove(columns.path)
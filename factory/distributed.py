@@ -0,0 +1,283 @@
+import multiprocessing
+import os
+import pickle
+import sys
+import threading
+import time
+import uuid
+from collections.abc import Mapping
+from concurrent.futures import Future
+from urllib.parse import quote
+
+from factory.factory import Backend, WorkStation, _SupplierResources, _build_detached, _detach
+
+
+class StoredResources(Mapping):
+    """
+    Read-only mapping of resources stored in a directory, one pickle per key, loaded when first
+    accessed. Used as the resources of a supplier on a worker, so that only the supplier
+    resources a workstation actually uses are transferred.
+    """
+
+    def __init__(self, path: str, keys: list):
+        """
+        :param path: str, resource directory
+        :param keys: list, of stored keys
+        """
+        self.path = path
+        self._keys = list(keys)
+        self._loaded = {}
+
+    def __getstate__(self):
+        return {'path': self.path, '_keys': self._keys, '_loaded': {}}
+
+    def __getitem__(self, key):
+        if key not in self._loaded:
+            if key not in self._keys:
+                raise KeyError(key)
+            self._loaded[key] = _load(_resource_path(self.path, key))
+        return self._loaded[key]
+
+    def __contains__(self, key) -> bool:
+        return key in self._keys
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+class DirectoryBackend(Backend):
+    """
+    Stage 3 backend building workstations on workers sharing a directory, for example local
+    worker processes, or remote workers on a shared filesystem started with:
+
+        python -m factory.distributed <path>
+
+    Each workstation is sent as a task holding its (unbuilt) tools and, for each supplier, a
+    reference to and the keys of the supplier resources, which are stored in the directory. Workers
+    claim tasks, load only the supplier resources used, build, and store the built resources for
+    the parent to collect and for later tasks to use.
+
+    Tools, resources and workstations must be picklable, as for the 'process' executor.
+    """
+
+    poll = 0.01
+
+    def __init__(self, path: str, workers=2, cleanup=True):
+        """
+        :param path: str, shared directory (created if missing)
+        :param workers: int, number of local worker processes to start, 0 to use external workers
+        :param cleanup: bool, remove tasks and stored resources of this run on exit
+        """
+        self.path = path
+        self.workers = workers
+        self.cleanup = cleanup
+        self.run = uuid.uuid4().hex[:12]
+        self._count = 0
+        self._published = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._processes = []
+        self._poller = None
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        for name in ('tasks', 'claimed', 'resources', 'done'):
+            os.makedirs(os.path.join(self.path, name), exist_ok=True)
+        self._stop.clear()
+        for _ in range(self.workers):
+            process = multiprocessing.Process(
+                target=worker_loop, args=(self.path,), kwargs={'run': self.run}, daemon=True
+            )
+            process.start()
+            self._processes.append(process)
+        self._poller = threading.Thread(target=self._poll, daemon=True)
+        self._poller.start()
+        return self
+
+    def __exit__(self, *exc):
+        tasks_dir = os.path.join(self.path, 'tasks')
+        for name in os.listdir(tasks_dir):  # ie left unclaimed after an error
+            if name.startswith(self.run):
+                os.remove(os.path.join(tasks_dir, name))
+        _write(os.path.join(self.path, f'{self.run}.stop'), None)
+        for process in self._processes:
+            process.join()
+        self._processes = []
+        self._stop.set()
+        self._poller.join()
+        self._poller = None
+        if self.cleanup:
+            self._remove_run()
+
+    def submit(self, station: WorkStation) -> Future:
+        """
+        Write workstation task, publishing any supplier resources not already stored.
+        :param station: workstation, with all suppliers built
+        :return: Future, of built resources
+        """
+        with self._lock:
+            self._count += 1
+            task = f'{self.run}-{self._count}'
+
+        detached = _detach(station)
+        if station.suppliers:
+            detached.suppliers = [
+                _SupplierResources(StoredResources(*self._publish(supplier)))
+                for supplier in station.suppliers
+            ]
+
+        future = Future()
+        future.set_running_or_notify_cancel()
+        with self._lock:
+            self._pending[task] = (future, station)
+        _write(os.path.join(self.path, 'tasks', task), detached)
+        return future
+
+    def _publish(self, supplier) -> (str, list):
+        """
+        Return reference and keys of stored supplier resources, storing them if necessary.
+        """
+        published = self._published.get(id(supplier))
+        if published is None:
+            with self._lock:
+                self._count += 1
+                ref = f'{self.run}-{self._count}'
+            _store_resources(self._resource_dir(ref), supplier.resources)
+            published = (self._resource_dir(ref), list(supplier.resources))
+            self._published[id(supplier)] = published
+        return published
+
+    def _poll(self) -> None:
+        """
+        Resolve futures of finished tasks, loading built resources.
+        """
+        done_dir = os.path.join(self.path, 'done')
+        while not self._stop.is_set():
+            with self._lock:
+                pending = list(self._pending)
+            for task in pending:
+                path = os.path.join(done_dir, task)
+                if not os.path.exists(path):
+                    continue
+                with self._lock:
+                    future, station = self._pending.pop(task)
+                try:
+                    result = _load(path)
+                    if 'error' in result:
+                        raise result['error']
+                    resource_dir = self._resource_dir(task)
+                    resources = {
+                        key: _load(_resource_path(resource_dir, key)) for key in result['keys']
+                    }
+                except Exception as error:
+                    future.set_exception(error)
+                    continue
+                self._published[id(station)] = (resource_dir, result['keys'])
+                future.set_result(resources)
+
+            if pending and self._processes and not any(p.is_alive() for p in self._processes):
+                with self._lock:
+                    failed, self._pending = self._pending, {}
+                for future, _ in failed.values():
+                    future.set_exception(RuntimeError('All local workers exited.'))
+            time.sleep(self.poll)
+
+    def _resource_dir(self, ref: str) -> str:
+        return os.path.join(self.path, 'resources', ref)
+
+    def _remove_run(self) -> None:
+        for root, dirs, files in os.walk(self.path, topdown=False):
+            for name in files:
+                if name.startswith(self.run) or os.path.basename(root).startswith(self.run):
+                    os.remove(os.path.join(root, name))
+            for name in dirs:
+                if name.startswith(self.run):
+                    os.rmdir(os.path.join(root, name))
+
+
+def worker_loop(path: str, run=None, idle_timeout=None) -> None:
+    """
+    Claim and build tasks from a shared directory until stopped.
+
+    Tasks are claimed by atomic rename, so that any number of workers may share a directory. A
+    worker started for a run (as by DirectoryBackend) stops once the run is stopped and no tasks
+    remain, otherwise it stops after idle_timeout seconds without tasks, or never.
+    :param path: str, shared directory
+    :param run: optional str, run to build tasks of
+    :param idle_timeout: optional float, seconds
+    :return: None
+    """
+    tasks_dir = os.path.join(path, 'tasks')
+    claimed_dir = os.path.join(path, 'claimed')
+    idle = time.monotonic()
+    while True:
+        tasks = sorted(
+            name for name in os.listdir(tasks_dir)
+            if not name.endswith('.tmp') and (run is None or name.startswith(run))
+        )
+        if not tasks:
+            if run is not None and os.path.exists(os.path.join(path, f'{run}.stop')):
+                return None
+            if idle_timeout is not None and time.monotonic() - idle > idle_timeout:
+                return None
+            time.sleep(DirectoryBackend.poll)
+            continue
+        for task in tasks:
+            claimed = os.path.join(claimed_dir, task)
+            try:
+                os.rename(os.path.join(tasks_dir, task), claimed)
+            except FileNotFoundError:  # ie claimed by another worker
+                continue
+            _run_task(path, task, claimed)
+            idle = time.monotonic()
+
+
+def _run_task(path: str, task: str, claimed: str) -> None:
+    """
+    Build claimed task, storing built resources and writing result (keys or error).
+    """
+    try:
+        station = _load(claimed)
+        resources = _build_detached(station)
+        _store_resources(os.path.join(path, 'resources', task), resources)
+        result = {'keys': list(resources)}
+    except Exception as error:
+        try:
+            pickle.dumps(error)
+        except Exception:
+            error = RuntimeError(repr(error))
+        result = {'error': error}
+    _write(os.path.join(path, 'done', task), result)
+    os.remove(claimed)
+
+
+def _store_resources(path: str, resources) -> None:
+    os.makedirs(path, exist_ok=True)
+    for key, resource in resources.items():
+        _write(_resource_path(path, key), resource)
+
+
+def _resource_path(path: str, key: str) -> str:
+    return os.path.join(path, quote(str(key), safe='') + '.pkl')
+
+
+def _write(path: str, obj) -> None:
+    """
+    Pickle to path atomically, so that readers never see a partial file.
+    """
+    temp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temp, 'wb') as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp, path)
+
+
+def _load(path: str):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+if __name__ == '__main__':
+    worker_loop(sys.argv[1])
@@ -1,100 +1,195 @@
-from collections import defaultdict
+import copy
+import importlib
+import sys
+import threading
+from collections import Counter, defaultdict, deque
+from collections.abc import Mapping
+from contextlib import contextmanager, nullcontext
+
+from factory.instrument import span
+from factory.requirements import RequirementSet, unique_key
+
+# note that asyncio, concurrent.futures, importlib.metadata and inspect are slow to import, so
+# are only imported by the functions using them
 
 
 class WorkStation:
     """
     Base Class for holding dictionary of Tool objects.
+
+    .tools maps requirement names to Tool classes, or to their import paths
+    ('package.module:Name') or entry points, which are only imported when a tool is first
+    required (see resolve_tool()), so that importing a factory module does not import the
+    dependencies of every tool.
+
+    Optionally set .executor to a concurrent.futures Executor to build thread or process safe
+    tools concurrently within the workstation, .cache to a factory.cache.ResourceCache to
+    reuse unchanged resources from previous runs, .registry to a
+    factory.registry.ResourceRegistry to share equivalent tools between workstations, and .lazy
+    to hold resources as LazyTool handles that only initiate their tool when built.
+
+    Optionally set .label to name the workstation in instrumentation spans and build plans,
+    otherwise it is named by class (see station_names()).
     """
     depth = 0
+    label = None
+    _name = None
     tools = {}
+    executor = None
+    cache = None
+    registry = None
+    lazy = False
 
     def __init__(self, config):
         self.resources = {}
         self.requirements = {}
+        self.requirements_cached = False
+        self.requirements_hits = 0
+        self.requirements_misses = 0
         self.config = config
         self.managers = None
         self.suppliers = None
 
-    def connect(self, managers: list, suppliers: list) -> None:
+    def connect(self, managers: list, suppliers: list, validate=False) -> None:
         """
         Connect workstations to their respective managers and suppliers to form a DAG.
         Note that arguments should be provided as lists.
+
+        If validate, raise ValueError (with the path of the cycle) if the new supplier edges
+        create a circular dependency, leaving the connections unchanged. See also
+        factory.validation for a full structural check.
         :param managers: list of managers
         :param suppliers: list of suppliers
+        :param validate: bool, check new supplier edges for cycles
         :return: None
         """
+        previous = self.managers, self.suppliers
         self.managers = managers
         self.suppliers = suppliers
+        if validate:
+            cycle = find_cycle(self)
+            if cycle:
+                self.managers, self.suppliers = previous
+                raise ValueError(
+                    f'Circular dependency between workstations: {describe_path(cycle)}.'
+                )
 
     def get_requirements(self):
         """
         Set own requirments by search backwards through managers chain gathering required tool
         requirements.
 
-        Note that this caches requirements dict in self._requirements.
+        Note that this caches requirements dict in self.requirements, including empty
+        requirements, until invalidate_requirements() is called. Cache use is counted in
+        self.requirements_hits and self.requirements_misses.
 
         If no managers then uses config requirements() method.
 
         Note that all tools are initiated for all required options and stored in
-        self._resources.
+        self.resources.
 
         :return: dict of requirements {req: [options]}
         """
-        if self.requirements:
+        if self.requirements_cached:
+            self.requirements_hits += 1
             return self.requirements
+        self.requirements_misses += 1
 
         if not self.managers:
-            # print(f'retrieving reqs from config at {self}: {self.config.requirements()}')
-            return self.config.get_requirements()
+            self.requirements = dict(self.config.get_requirements() or {})
+            self.requirements_cached = True
+            return self.requirements
 
-        reqs = []
+        reqs = RequirementSet()
         for manager in self.managers:
-            for manager_requirement, options in manager.get_requirements().items():
-                if manager_requirement not in list(self.tools):  # ie tool not available
+            manager_requirements = manager.get_requirements()
+            # initiate in order of own tools, as manager requirements may be much larger
+            for manager_requirement in self.tools or {}:
+                if manager_requirement not in manager_requirements:  # ie tool not required
                     continue
+                options = manager_requirements[manager_requirement]
                 if options is None:
                     option = None
                     key = manager_requirement
                     self._build_manager_requirement(key, manager_requirement, option, reqs)
                 else:
                     for option in options:
-                        key = manager_requirement + ':' + option
+                        key = unique_key(manager_requirement, option)
                         self._build_manager_requirement(key, manager_requirement, option, reqs)
 
         # cache reqs
-        self.requirements = combine_reqs(reqs)
+        self.requirements = reqs.to_dict()
+        self.requirements_cached = True
         return self.requirements
 
+    def invalidate_requirements(self, suppliers=True) -> None:
+        """
+        Invalidate cached requirements, by default also for all workstations supplying this one,
+        as their requirements are derived from it.
+        :param suppliers: bool, also invalidate all (direct and indirect) suppliers
+        :return: None
+        """
+        for station in supplier_graph(self) if suppliers else [self]:
+            station.requirements = {}
+            station.requirements_cached = False
+
     def _build_manager_requirement(
             self,
             key: str,
             manager_requirement,
             option,
-            reqs: list
+            reqs: RequirementSet
     ) -> None:
         """
-        Helper method to reduce repetition. Initiates required tools, adds them to workstation
-        resources, and builds list of requirements.
+        Helper method to reduce repetition. Initiates required tools (unless already available),
+        adds them to workstation resources, and merges their requirements.
         :param key: str, unique key for .resource map
         :param manager_requirement: str, tool key
         :param option: required tool option
-        :param reqs: full list of current requirements
+        :param reqs: RequirementSet, of current requirements
         :return: None
         """
-        if key in list(self.resources):
-            return None
         tool = self.tools.get(manager_requirement)
         if not tool:
             return None
-        resource = tool(option)
+        resource = self._initiate_resource(key, tool, option)
         tool_reqs = resource.get_requirements()
-        reqs.append(tool_reqs)
-        self.resources[key] = resource
+        reqs.update(tool_reqs)
+
+    def _initiate_resource(self, key: str, tool, option):
+        """
+        Helper method to return the resource at given key of .resources, initiating tool with
+        option only if the key is not already available, so that existing resources are reused.
+        If .lazy, a LazyTool handle is used instead of initiating the tool.
+        :param key: str, unique key for .resource map
+        :param tool: tool class, import path or entry point
+        :param option: required tool option
+        :return: tool instance (or LazyTool)
+        """
+        resource = self.resources.get(key)
+        if resource is None:
+            tool = resolve_tool(tool)
+            resource = LazyTool(tool, option) if self.lazy else tool(option)
+            self.resources[key] = resource
+        return resource
+
+    def _materialize(self, key: str):
+        """
+        Helper method to return the resource at given key of .resources, replacing a LazyTool
+        handle with its initiated tool.
+        :param key: str, .resources key
+        :return: tool instance
+        """
+        resource = self.resources[key]
+        if isinstance(resource, LazyTool):
+            resource = resource.materialize()
+            self.resources[key] = resource
+        return resource
 
     def _engage_suppliers(self):
         """
-        Engage suppliers, initiating their tools and getting their requirements. Raises
-        ValueError if suppliers have missing tools.
+        Engage suppliers, initiating their tools (unless already available) and getting their
+        requirements. Raises ValueError if suppliers have missing tools.
         :return:
         """
         requirements = self.get_requirements()
@@ -114,29 +209,38 @@ class WorkStation:
 
         # activate suppliers and validate options and set their requirements
         for supplier in self.suppliers:
-            supplier_requirement_list = []
+            supplier_requirements = RequirementSet()
             # initiate in order
             if not supplier.tools:
                 continue
             for tool_name, tool in supplier.tools.items():
                 if not tool:
                     continue
-                if tool_name in list(requirements):
+                if tool_name in requirements:
                     options = requirements[tool_name]
                     if not options:
-                        resource = tool(None)
                         key = tool_name
-                        supplier.resources[key] = resource
-                        supplier_requirement_list.append(resource.get_requirements())
+                        resource = supplier._initiate_resource(key, tool, None)
+                        supplier_requirements.update(resource.get_requirements())
 
                     else:
                         for option in options:
-                            resource = tool(option)
-                            key = tool_name + ':' + option
-                            supplier.resources[key] = resource
-                            supplier_requirement_list.append(resource.get_requirements())
+                            key = unique_key(tool_name, option)
+                            resource = supplier._initiate_resource(key, tool, option)
+                            supplier_requirements.update(resource.get_requirements())
             # update supplier req dict
-            supplier.requirements.update(combine_reqs(supplier_requirement_list))
+            supplier.requirements = RequirementSet.union(
+                [supplier.requirements, supplier_requirements]
+            ).to_dict()
+            supplier.requirements_cached = True
+
+    def gather_resources(self) -> Mapping:
+        """
+        Gather resources from suppliers for current workstation, as a read-only view over
+        supplier .resources (see ResourceView).
+        :return: mapping, of supplier resources
+        """
+        return ResourceView([supplier.resources for supplier in self.suppliers or []])
 
     def build(self):
         """
@@ -144,23 +248,277 @@ class WorkStation:
         order of .resources map.
         :return: None
         """
-        # gather resources
-        supplier_resources = {}
-        if self.suppliers:
-            for supplier in self.suppliers:
-                supplier_resources.update(supplier.resources)
-        if self.resources:
-            for tool_name, tool in self.resources.items():
-                tool.build(supplier_resources)
+        self.build_resources(list(self.resources))
+
+    def build_resources(self, keys: list):
+        """
+        Gather resources from suppliers for current workstation (as a view shared by all tools)
+        and build() given keys of .resources in order.
+
+        If .executor is set, tools declared .thread_safe (for thread based executors) or
+        .process_safe (for a ProcessPoolExecutor) are submitted to it, and remaining serial tools
+        are built in order meanwhile. Tools built in another process replace their originals,
+        keeping the order of the .resources map.
+
+        If .cache is set, unchanged resources are restored from the cache instead of being built,
+        and newly built resources are stored.
+        :param keys: list, of .resources keys to build
+        :return: None
+        """
+        supplier_resources = self.gather_resources()
+        if not keys:
+            return None
+
+        if self.cache is not None:
+            keys = self.cache.restore(self.resources, supplier_resources, keys)
+
+        self._build_tools(keys, supplier_resources)
+
+        if self.cache is not None:
+            self.cache.save(self.resources, keys)
+
+    def _build_tools(self, keys: list, supplier_resources: Mapping) -> None:
+        """
+        Helper method to build given keys of .resources, using .executor if set.
+        :param keys: list, of .resources keys to build
+        :param supplier_resources: mapping, of supplier resources
+        :return: None
+        """
+        if self.executor is None:
+            for key in keys:
+                self._build_resource(key, supplier_resources)
+            return None
+
+        from concurrent.futures import ProcessPoolExecutor
+        in_process = isinstance(self.executor, ProcessPoolExecutor)
+        futures = {}
+        for key in keys:
+            tool = self.resources[key]
+            if in_process and getattr(tool, 'process_safe', False):
+                futures[key] = self.executor.submit(_build_tool, tool, supplier_resources)
+            elif not in_process and getattr(tool, 'thread_safe', False):
+                futures[key] = self.executor.submit(
+                    self._build_resource, key, supplier_resources
+                )
+        for key in keys:
+            if key not in futures:
+                self._build_resource(key, supplier_resources)
+
+        # collect in original order
+        for key, future in futures.items():
+            result = future.result()
+            if in_process:
+                self.resources[key] = result
+
+    def _build_resource(self, key: str, supplier_resources: Mapping) -> None:
+        """
+        Helper method to build a single resource, recording an instrumentation span. If
+        .registry is set, an equivalent tool already built elsewhere is shared instead.
+        :param key: str, .resources key
+        :param supplier_resources: mapping, of supplier resources
+        :return: None
+        """
+        if self.registry is not None:
+            self.resources[key] = self.registry.share(
+                self.resources[key],
+                supplier_resources,
+                lambda: self._build_own_resource(key, supplier_resources)
+            )
+            return None
+        self._build_own_resource(key, supplier_resources)
+
+    def _build_own_resource(self, key: str, supplier_resources: Mapping):
+        """
+        Helper method to build a single resource, see _build_resource().
+        :param key: str, .resources key
+        :param supplier_resources: mapping, of supplier resources
+        :return: built tool
+        """
+        tool = self._materialize(key)
+        with span('tool', key, workstation=_station_name(self), tool=type(tool).__name__):
+            _check_not_async(tool, tool.build(supplier_resources))
+        return tool
+
+    async def build_async(self, limit=None, pool=None):
+        """
+        Async counterpart of build(). Tools defining an async build() are awaited concurrently on
+        the running event loop, and sync tools are run in a thread pool (concurrently if
+        .thread_safe, else one at a time in order of .resources map).
+
+        Workstations overriding build(), build_resources() or _build_tools() are built by
+        running their sync build() in the thread pool.
+        :param limit: optional asyncio.Semaphore, limiting concurrent tool builds
+        :param pool: optional concurrent.futures.ThreadPoolExecutor, for sync tools
+        :return: None
+        """
+        import asyncio
+
+        if _overrides_build(self):
+            async with limit or nullcontext():
+                await asyncio.get_running_loop().run_in_executor(pool, self.build)
+            return None
+        await self.build_resources_async(list(self.resources), limit=limit, pool=pool)
+
+    async def build_resources_async(self, keys: list, limit=None, pool=None):
+        """
+        Async counterpart of build_resources(), see build_async().
+        :param keys: list, of .resources keys to build
+        :param limit: optional asyncio.Semaphore, limiting concurrent tool builds
+        :param pool: optional concurrent.futures.ThreadPoolExecutor, for sync tools
+        :return: None
+        """
+        import asyncio
+        import inspect
+
+        supplier_resources = self.gather_resources()
+        if not keys:
+            return None
+        loop = asyncio.get_running_loop()
+
+        if self.cache is not None:
+            keys = await loop.run_in_executor(
+                pool, self.cache.restore, self.resources, supplier_resources, keys
+            )
+
+        serial = asyncio.Lock()
+
+        async def build(key):
+            resource = self.resources[key]
+            tool_class = getattr(resource, 'tool_class', type(resource))  # ie LazyTool
+            if inspect.iscoroutinefunction(tool_class.build):
+                async with limit or nullcontext():
+                    await self._build_resource_async(key, supplier_resources, pool)
+            elif getattr(resource, 'thread_safe', False):  # ie initiated by _build_resource()
+                async with limit or nullcontext():
+                    await loop.run_in_executor(pool, self._build_resource, key, supplier_resources)
+            else:
+                async with serial, limit or nullcontext():
+                    await loop.run_in_executor(pool, self._build_resource, key, supplier_resources)
+
+        await asyncio.gather(*(build(key) for key in keys))
+
+        if self.cache is not None:
+            await loop.run_in_executor(pool, self.cache.save, self.resources, keys)
+
+
+    async def _build_resource_async(self, key: str, supplier_resources: Mapping, pool) -> None:
+        """
+        Async counterpart of _build_resource(), for tools with an async build().
+        :param key: str, .resources key
+        :param supplier_resources: mapping, of supplier resources
+        :param pool: optional concurrent.futures.ThreadPoolExecutor, to initiate lazy tools
+        :return: None
+        """
+        import asyncio
+
+        async def build():
+            # initiated in the pool, as initiating lazy tools may be expensive
+            tool = await asyncio.get_running_loop().run_in_executor(pool, self._materialize, key)
+            # note that cpu and memory of interleaved async spans are not separable
+            with span('tool', key, workstation=_station_name(self), tool=type(tool).__name__):
+                await tool.build(supplier_resources)
+            return tool
+
+        if self.registry is not None:
+            self.resources[key] = await self.registry.share_async(
+                self.resources[key], supplier_resources, build
+            )
+            return None
+        await build()
+
+
+class ResourceView(Mapping):
+    """
+    Read-only view over the resources of several suppliers, chained without copying. Where
+    suppliers share a key, the resource of the last supplier is used, as if their resources were
+    merged in order.
+    """
+    __slots__ = ('_maps',)
+
+    def __init__(self, maps: list):
+        """
+        :param maps: list, of supplier resource dicts, in supplier order
+        """
+        self._maps = maps[::-1]
+
+    def __getitem__(self, key):
+        for resources in self._maps:
+            if key in resources:
+                return resources[key]
+        raise KeyError(key)
+
+    def __contains__(self, key) -> bool:
+        for resources in self._maps:
+            if key in resources:
+                return True
+        return False
+
+    def __iter__(self):
+        if len(self._maps) == 1:
+            yield from self._maps[0]
+            return
+        seen = set()
+        for resources in reversed(self._maps):
+            for key in resources:
+                if key not in seen:
+                    seen.add(key)
+                    yield key
+
+    def __len__(self) -> int:
+        if len(self._maps) == 1:
+            return len(self._maps[0])
+        return len(set().union(*self._maps))
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+class StreamWorkStation(WorkStation):
+    """
+    Workstation that streams supplier resources to its tools. Before building, each streamed
+    supplier resource (StreamTool) that is required here is read in a single pass, and every
+    record is dispatched to all tools requiring it (its consumers) via Tool.consume().
+    """
+
+    def _build_tools(self, keys: list, supplier_resources: Mapping) -> None:
+        """
+        Drive a single pass over each streamed supplier resource, dispatching records to the
+        consumers among given keys, then build them in order. Called by build_resources() after
+        restoring cached resources, so that streams are only read for tools still to be built.
+        :param keys: list, of .resources keys to build
+        :param supplier_resources: mapping, of supplier resources
+        :return: None
+        """
+        # register consumers
+        consumers = defaultdict(list)
+        for key in keys:
+            for requirement in convert_to_unique_keys(self.resources[key].get_requirements()):
+                if isinstance(supplier_resources.get(requirement), StreamTool):
+                    consumers[requirement].append(self._materialize(key))
+
+        for requirement, tools in consumers.items():
+            for tool in tools:
+                tool.prepare_consume(requirement, supplier_resources[requirement])
+            for record in supplier_resources[requirement].stream():
+                for tool in tools:
+                    tool.consume(requirement, record)
+
+        super()._build_tools(keys, supplier_resources)
 
 
 # Define tools to be used by Sub Processes
 class Tool:
     """
     Base tool class.
+
+    Set .thread_safe or .process_safe to allow a workstation .executor to build the tool
+    concurrently with other tools. Process safe tools must be picklable, along with the
+    resources they require.
     """
     req = None
     valid_options = [None]
+    thread_safe = False
+    process_safe = False
 
     def __init__(self, option=None):
         """
@@ -172,6 +530,23 @@ class Tool:
             raise UserWarning(f'Unsupported option: {option} at tool: {self}')
         self.option = option
 
+    @classmethod
+    def requirements_for(cls, option=None) -> dict:
+        """
+        Return requirements of tool for given option without initiating the tool, for dry-run
+        planning. Raise UserWarning if option is not in .valid_options.
+
+        By default, get_requirements() is called on an uninitiated instance with only .option set.
+        Tools whose requirements depend on other state set in __init__ should override this.
+        :param option: optional option
+        :return: dict of requirements
+        """
+        if option not in cls.valid_options:
+            raise UserWarning(f'Unsupported option: {option} at tool: {cls.__name__}')
+        tool = cls.__new__(cls)
+        tool.option = option
+        return tool.get_requirements()
+
     def get_requirements(self) -> dict:
         """
         Default return requirements of tool for given .option.
@@ -191,23 +566,126 @@ class Tool:
         :return: None
         """
         for requirement in convert_to_unique_keys(self.get_requirements()):
-            if requirement not in list(resource):
+            if requirement not in resource:
                 raise ValueError(f'Missing requirement: {requirement}')
         print(f'\tBuilt {self}')
 
+    def prepare_consume(self, requirement: str, source: 'StreamTool') -> None:
+        """
+        Prepare to consume records from a streamed requirement, eg reading the .fields of its
+        source. Called by a StreamWorkStation before the records are streamed.
+        :param requirement: str, unique key of streamed requirement
+        :param source: StreamTool, streamed supplier resource
+        :return: None
+        """
+        return None
+
+    def consume(self, requirement: str, record) -> None:
+        """
+        Consume a record (or chunk of records) from a streamed requirement. Called by a
+        StreamWorkStation for each record, before build().
+        :param requirement: str, unique key of streamed requirement
+        :param record: record or chunk of records
+        :return: None
+        """
+        raise NotImplementedError(f'Consume not implemented at tool: {self}')
+
+
+class LazyTool:
+    """
+    Handle for a tool that is not yet initiated, held in workstation .resources in place of the
+    tool during planning. Requirements are resolved from class-level metadata
+    (Tool.requirements_for()), and the tool is only initiated by materialize(), when built.
+    """
+    __slots__ = ('_tool_class', 'option', 'fingerprint', '_requirements')
+
+    def __init__(self, tool_class, option=None, requirements=None):
+        """
+        Raise UserWarning if option is not in tool .valid_options.
+        :param tool_class: tool class, or import path (imported when first needed)
+        :param option: optional option
+        :param requirements: optional dict, of already resolved requirements (eg from a compiled
+            plan), otherwise resolved with tool_class.requirements_for()
+        """
+        self._tool_class = tool_class
+        self.option = option
+        self.fingerprint = None
+        if requirements is None:
+            requirements = self.tool_class.requirements_for(option)
+        self._requirements = requirements
+
+    @property
+    def tool_class(self) -> type:
+        if not isinstance(self._tool_class, type):
+            self._tool_class = resolve_tool(self._tool_class)
+        return self._tool_class
+
+    @property
+    def thread_safe(self) -> bool:
+        return self.tool_class.thread_safe
+
+    @property
+    def process_safe(self) -> bool:
+        return self.tool_class.process_safe
+
+    def get_requirements(self) -> dict:
+        return self._requirements
+
+    def materialize(self):
+        """
+        Initiate the tool.
+        :return: tool instance
+        """
+        tool = self.tool_class(self.option)
+        if self.fingerprint is not None:
+            tool.fingerprint = self.fingerprint
+        return tool
+
+    def __repr__(self) -> str:
+        return f'LazyTool({self.tool_class.__name__}, {self.option!r})'
+
+
+class StreamTool(Tool):
+    """
+    Base tool class for resources supplied as a single-pass stream of records (or chunks of
+    records), such as events. Consumers at a StreamWorkStation share one pass over the stream.
+
+    Set .fields to the field names of records that are not mappings (eg tuples).
+    """
+    fields = None
+
+    def stream(self):
+        """
+        Yield records (or chunks of records) of the resource.
+        :return: iterator
+        """
+        raise NotImplementedError(f'Stream not implemented at tool: {self}')
+
 
-def operate_workstation_graph(start_node: WorkStation, verbose=False) -> list:
+def operate_workstation_graph(
+        start_node: WorkStation,
+        verbose=False,
+        executor=None,
+        max_workers=None,
+        cache=None,
+        registry=None,
+        lazy=False,
+        release=False,
+        keep=None
+) -> list:
     """
     Main function for validating graph requirements, then initiating and building minimum resources.
 
-    Stage1: Traverse graph from starting workstation to suppliers with depth-first search,
-    marking workstations with possible longest path.
+    Stage1: Traverse graph from starting workstation to suppliers in topological order,
+    marking workstations with longest path.
 
     Stage 2: Traverse graph with breadth-first search, prioritising shallowest nodes, sequentially
     initiating required workstation .tools as .resources and building .requirements.
 
     Stage 3: Traverse graph along same path but backward, gathering resources from suppliers at
-    each workstation and building all own resources.
+    each workstation and building all own resources. Optionally, with executor 'thread' or
+    'process', each workstation is built in a pool as soon as all of its suppliers are built, or
+    with 'resource', each resource as soon as the supplier resources it requires are built.
 
     Note that circular dependencies are not supported.
 
@@ -216,68 +694,1011 @@ def operate_workstation_graph(start_node: WorkStation, verbose=False) -> list:
 
     :param start_node: starting workstation
     :param verbose: bool, verbose behaviour
+    :param executor: optional str, 'thread', 'process' or 'resource', or a Backend, to build
+        workstations (or resources) concurrently
+    :param max_workers: optional int, maximum number of concurrent workstation builds
+    :param cache: optional factory.cache.ResourceCache, used by all workstations
+    :param registry: optional factory.registry.ResourceRegistry, used by all workstations
+    :param lazy: bool, initiate tools only when they are built (see LazyTool)
+    :param release: bool, release intermediate resources once all their consumers are built
+    :param keep: optional iterable, of resource keys never to release
     :return: list, sequence of visits for stages 2 (initiation and validation) and 3 (building)
     """
 
+    with _workstation_settings(start_node, cache=cache, registry=registry, lazy=lazy):
+        # stages 1 and 2:
+        sequence = _plan_workstation_graph(start_node, verbose=verbose)
+
+        # stage 3:
+        with span('stage', 'stage_3', executor=executor):
+            built = build_workstation_graph(
+                sequence,
+                verbose=verbose,
+                executor=executor,
+                max_workers=max_workers,
+                release=release,
+                keep=keep
+            )
+
+    # return full sequence for testing
+    return sequence + built
+
+
+def _plan_workstation_graph(start_node: WorkStation, verbose=False) -> list:
+    """
+    Helper function running stages 1 and 2 for operate_workstation_graph() and its async
+    counterpart, naming workstations for instrumentation as in factory.plan (see
+    station_names()).
+    :param start_node: starting workstation
+    :param verbose: bool, verbose behaviour
+    :return: list, stage 2 sequence of workstations
+    """
     # stage 1:
-    build_graph_depth(start_node)
+    with span('stage', 'stage_1'):
+        build_graph_depth(start_node)
+    stations = supplier_graph(start_node)
+    names = station_names(stations)
+    for station in stations:
+        station._name = names[id(station)]
 
     # stage 2:
-    visited = []
-    queue = []
-    start_node._engage_suppliers()
-    queue.append(start_node)
-    visited.append(start_node)
+    with span('stage', 'stage_2'):
+        return engage_workstation_graph(start_node, verbose=verbose)
+
+
+@contextmanager
+def _workstation_settings(start_node: WorkStation, cache=None, registry=None, lazy=False):
+    """
+    Set the .cache, .registry and .lazy of all workstations supplying the starting workstation
+    for the duration of a run, where given, restoring their own settings afterwards so that
+    they do not leak into later runs.
+    :param start_node: starting workstation
+    :param cache: optional factory.cache.ResourceCache, used by all workstations
+    :param registry: optional factory.registry.ResourceRegistry, used by all workstations
+    :param lazy: bool, initiate tools only when they are built (see LazyTool)
+    :return: None
+    """
+    settings = {'cache': cache, 'registry': registry, 'lazy': lazy or None}
+    settings = {name: value for name, value in settings.items() if value is not None}
+    stations = supplier_graph(start_node)
+    previous = [
+        {name: vars(station)[name] for name in settings if name in vars(station)}
+        for station in stations
+    ]
+    for station in stations:
+        for name, value in settings.items():
+            setattr(station, name, value)
+    try:
+        yield
+    finally:
+        for station, own in zip(stations, previous):
+            for name in settings:
+                if name in own:
+                    setattr(station, name, own[name])
+                else:
+                    delattr(station, name)  # ie back to the class default
+
+
+def engage_workstation_graph(start_node: WorkStation, verbose=False) -> list:
+    """
+    Stage 2 scheduler. Traverse graph of suppliers with breadth-first search, prioritising
+    shallowest nodes, engaging the suppliers of each workstation in turn.
+
+    The queue is a deque and visited workstations are indexed by identity, so each workstation
+    is queued once and each supplier edge is checked in constant time.
+
+    :param start_node: starting workstation
+    :param verbose: bool, verbose behaviour
+    :return: list, sequence of visited workstations
+    """
+    sequence = [start_node]
+    visited = {id(start_node)}
+    queue = deque([start_node])
 
     while queue:
-        current = queue.pop(0)
+        current = queue.popleft()
         if current.suppliers:
             if verbose:
                 print('VALIDATING: ', current)
             current._engage_suppliers()
 
             for supplier in order_by_distance(current.suppliers):
-                if supplier not in visited:
+                if id(supplier) not in visited:
+                    visited.add(id(supplier))
                     queue.append(supplier)
-                    visited.append(supplier)
-    # stage 3:
-    sequence = visited
-    return_queue = visited[::-1]
-    visited = []
-    while return_queue:
-        current = return_queue.pop(0)
-        if verbose:
-            print('BUILDING: ', current)
-        current.build()
-        visited.append(current)
-    # return full sequence for testing
-    return sequence + visited
+                    sequence.append(supplier)
+    return sequence
 
 
-def build_graph_depth(current: WorkStation, visited=None, depth=0) -> list:
+def build_workstation_graph(
+        sequence: list,
+        verbose=False,
+        executor=None,
+        max_workers=None,
+        release=False,
+        keep=None
+) -> list:
     """
-    Function to recursive depth-first traverse graph of suppliers, recording workstation depth in
-    graph.
-    :param current: starting workstation
-    :param visited: list, visited workstations
-    :param depth: current depth
-    :return: list, visited workstations in order
+    Stage 3 scheduler. Build workstations in reverse order of the given stage 2 sequence.
+
+    If an executor is given ('thread', 'process' or a Backend instance), workstations are instead
+    submitted to the backend as soon as all of their suppliers have been built, so that
+    independent workstations are built concurrently. In 'process' mode, workstations are built in
+    worker processes from a copy holding only supplier resources, and built resources are
+    returned to the workstation. With 'resource', individual resources are scheduled instead
+    (see build_resource_graph()).
+
+    If release, the number of resources consuming each supplier resource is counted, and a
+    supplier resource is removed from its workstation .resources once all the workstations
+    consuming it are built. Resources that are not consumed (ie final products), and keys in keep,
+    are never released.
+
+    :param sequence: list, of workstations as returned by engage_workstation_graph()
+    :param verbose: bool, verbose behaviour
+    :param executor: optional str, 'thread', 'process' or 'resource', or a Backend
+    :param max_workers: optional int, maximum number of concurrent workstation builds
+    :param release: bool, release consumed resources once no longer required
+    :param keep: optional iterable, of resource keys never to release
+    :return: list, sequence of built workstations
     """
-    if not visited:
+    if executor == 'resource':
+        return build_resource_graph(
+            sequence, verbose=verbose, max_workers=max_workers, release=release, keep=keep
+        )
+
+    tracker = _ReleaseTracker(sequence, keep) if release else None
+
+    if executor is None:
         visited = []
-    visited.append(current)
+        for current in reversed(sequence):
+            if verbose:
+                print('BUILDING: ', current)
+            if tracker:
+                tracker.start(current)
+            _build_station(current)
+            visited.append(current)
+            if tracker:
+                tracker.done(current)
+        return visited
+
+    if isinstance(executor, str):
+        if executor not in EXECUTORS:
+            expected = list(EXECUTORS) + ['resource']
+            raise ValueError(f'Unsupported executor: {executor}, expected one of {expected}.')
+        backend = EXECUTORS[executor](max_workers=max_workers)
+    elif isinstance(executor, Backend):
+        backend = executor
+    else:
+        raise ValueError(f'Unsupported executor: {executor}, expected str or Backend.')
+
+    from concurrent.futures import FIRST_COMPLETED, wait
+
+    waiting, dependants = _index_dependants(sequence)
+    visited = []
+    with backend:
+        futures = {}
+
+        def submit(station):
+            if verbose:
+                print('BUILDING: ', station)
+            if tracker:
+                tracker.start(station)
+            futures[backend.submit(station)] = station
+
+        for current in reversed(sequence):
+            if not waiting[id(current)]:
+                submit(current)
+
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                current = futures.pop(future)
+                resources = future.result()
+                if resources is not None:
+                    current.resources = resources
+                visited.append(current)
+                if tracker:
+                    tracker.done(current)
+                for manager in dependants[id(current)]:
+                    waiting[id(manager)] -= 1
+                    if not waiting[id(manager)]:
+                        submit(manager)
+
+    return visited
+
+
+def build_resource_graph(
+        sequence: list,
+        verbose=False,
+        max_workers=None,
+        release=False,
+        keep=None
+) -> list:
+    """
+    Fine-grained stage 3 scheduler. Build the resolved resource DAG in a thread pool, where each
+    resource waits only on the exact supplier resources of its get_requirements(), rather than
+    on whole supplier workstations, so that a resource starts as soon as those keys are built.
+
+    Resources of a workstation are built with build_resources([key]), so .cache and LazyTool
+    handles work as usual, and tools that are not .thread_safe are built one at a time per
+    workstation. Workstations overriding build() or build_resources() (eg StreamWorkStation), and
+    workstations without resources, are built whole once all of their suppliers are built. As
+    such workstations may only set their resources when built, all resources of their managers
+    wait on them.
+
+    :param sequence: list, of workstations as returned by engage_workstation_graph()
+    :param verbose: bool, verbose behaviour
+    :param max_workers: optional int, maximum number of concurrent resource builds
+    :param release: bool, release consumed resources once no longer required
+    :param keep: optional iterable, of resource keys never to release
+    :return: list, sequence of built workstations, in order of completion
+    """
+    from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+    dependencies = _resolve_resource_suppliers(sequence)
+    tracker = _ReleaseTracker(sequence, keep) if release else None
+
+    # units of work are (workstation, key), or (workstation, None) to build a workstation whole
+    units = []
+    unit_of = {}
+    station_units = defaultdict(list)
+    whole_units = {}
+    for station in reversed(sequence):
+        whole = _builds_whole(station)
+        if whole:
+            station_units[id(station)].append(len(units))
+            whole_units[id(station)] = len(units)
+            units.append((station, None))
+        for key in station.resources:
+            if not whole:
+                station_units[id(station)].append(len(units))
+                units.append((station, key))
+            unit_of[(id(station), key)] = len(units) - 1
+
+    supplier_units = []
+    consumed = []
+    for station, key in units:
+        keys = list(station.resources) if key is None else [key]
+        pairs = [pair for k in keys for pair in dependencies[(id(station), k)]]
+        consumed.append(pairs)
+        if key is None:  # ie wait on all units of all suppliers
+            supplier_units.append({
+                unit for supplier in station.suppliers or []
+                for unit in station_units[id(supplier)]
+            })
+        else:  # ie wait on the supplier resources required, and on suppliers built whole
+            supplier_units.append({unit_of[(id(supplier), k)] for supplier, k in pairs} | {
+                whole_units[id(supplier)] for supplier in station.suppliers or []
+                if id(supplier) in whole_units
+            })
+
+    waiting = [len(unit_suppliers) for unit_suppliers in supplier_units]
+    dependants = defaultdict(list)
+    for unit, unit_suppliers in enumerate(supplier_units):
+        for supplier_unit in unit_suppliers:
+            dependants[supplier_unit].append(unit)
+
+    remaining = defaultdict(int)
+    for station, _ in units:
+        remaining[id(station)] += 1
+    locks = {id(station): threading.Lock() for station in sequence}
+
+    visited = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {}
+
+        def submit(unit):
+            station, key = units[unit]
+            if verbose:
+                print('BUILDING: ', station, key or '')
+            if tracker:
+                tracker.start(station)
+            futures[pool.submit(_build_unit, station, key, locks[id(station)])] = unit
+
+        for unit in range(len(units)):
+            if not waiting[unit]:
+                submit(unit)
 
-    # Recur for all the nodes supplying this node
-    if current.suppliers:
-        depth = depth + 1
-        for supplier in current.suppliers:
-            if supplier.depth < depth:
-                supplier.depth = depth
-            build_graph_depth(supplier, visited, depth)
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                unit = futures.pop(future)
+                future.result()
+                station, _ = units[unit]
+                remaining[id(station)] -= 1
+                if not remaining[id(station)]:
+                    visited.append(station)
+                if tracker:
+                    tracker.done(station, consumed[unit])
+                for dependant in dependants[unit]:
+                    waiting[dependant] -= 1
+                    if not waiting[dependant]:
+                        submit(dependant)
 
     return visited
 
 
+def _builds_whole(station: WorkStation) -> bool:
+    """
+    Helper function to check if a workstation must be built whole, rather than per resource.
+    :param station: workstation
+    :return: bool
+    """
+    return not station.resources or _overrides_build(station)
+
+
+def _overrides_build(station: WorkStation) -> bool:
+    """
+    Helper function to check if a workstation overrides how its resources are built (eg
+    StreamWorkStation), so that it must be built with its own build().
+    :param station: workstation
+    :return: bool
+    """
+    station_class = type(station)
+    return station_class.build is not WorkStation.build or \
+        station_class.build_resources is not WorkStation.build_resources or \
+        station_class._build_tools is not WorkStation._build_tools
+
+
+def _build_unit(station: WorkStation, key, lock) -> None:
+    """
+    Build a single resource of a workstation, or the whole workstation if key is None. Resources
+    that are not .thread_safe are built holding the workstation lock.
+    :param station: workstation
+    :param key: str, .resources key, or None
+    :param lock: threading.Lock, of the workstation
+    :return: None
+    """
+    if key is None:
+        _build_station(station)
+    elif getattr(station.resources[key], 'thread_safe', False):
+        station.build_resources([key])
+    else:
+        with lock:
+            station.build_resources([key])
+
+
+async def build_workstation_graph_async(
+        sequence: list,
+        verbose=False,
+        max_concurrency=None,
+        max_workers=None,
+        release=False,
+        keep=None
+) -> list:
+    """
+    Async stage 3 scheduler. Each workstation is built (see WorkStation.build_async()) as soon as
+    all of its suppliers have been built, so that the tools of all ready workstations are
+    awaited concurrently on the running event loop.
+
+    :param sequence: list, of workstations as returned by engage_workstation_graph()
+    :param verbose: bool, verbose behaviour
+    :param max_concurrency: optional int, maximum number of concurrent tool builds
+    :param max_workers: optional int, maximum number of threads building sync tools
+    :param release: bool, release consumed resources once no longer required
+    :param keep: optional iterable, of resource keys never to release
+    :return: list, sequence of built workstations
+    """
+    tracker = _ReleaseTracker(sequence, keep) if release else None
+
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+
+    limit = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+    waiting, dependants = _index_dependants(sequence)
+    visited = []
+    tasks = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+
+        def submit(station):
+            if verbose:
+                print('BUILDING: ', station)
+            if tracker:
+                tracker.start(station)
+            tasks[asyncio.ensure_future(_build_station_async(station, limit, pool))] = station
+
+        try:
+            for current in reversed(sequence):
+                if not waiting[id(current)]:
+                    submit(current)
+
+            while tasks:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    current = tasks.pop(task)
+                    task.result()
+                    visited.append(current)
+                    if tracker:
+                        tracker.done(current)
+                    for manager in dependants[id(current)]:
+                        waiting[id(manager)] -= 1
+                        if not waiting[id(manager)]:
+                            submit(manager)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return visited
+
+
+async def operate_workstation_graph_async(
+        start_node: WorkStation,
+        verbose=False,
+        max_concurrency=None,
+        max_workers=None,
+        cache=None,
+        registry=None,
+        lazy=False,
+        release=False,
+        keep=None
+) -> list:
+    """
+    Async counterpart of operate_workstation_graph(), for graphs of I/O bound tools. Stages 1 and
+    2 are run as usual, then stage 3 is awaited with build_workstation_graph_async(), so that
+    tools defining an async build() are awaited concurrently and sync tools are run in a thread
+    pool.
+
+    :param start_node: starting workstation
+    :param verbose: bool, verbose behaviour
+    :param max_concurrency: optional int, maximum number of concurrent tool builds
+    :param max_workers: optional int, maximum number of threads building sync tools
+    :param cache: optional factory.cache.ResourceCache, used by all workstations
+    :param registry: optional factory.registry.ResourceRegistry, used by all workstations
+    :param lazy: bool, initiate tools only when they are built (see LazyTool)
+    :param release: bool, release intermediate resources once all their consumers are built
+    :param keep: optional iterable, of resource keys never to release
+    :return: list, sequence of visits for stages 2 (initiation and validation) and 3 (building)
+    """
+
+    with _workstation_settings(start_node, cache=cache, registry=registry, lazy=lazy):
+        # stages 1 and 2:
+        sequence = _plan_workstation_graph(start_node, verbose=verbose)
+
+        # stage 3:
+        with span('stage', 'stage_3', executor='async'):
+            built = await build_workstation_graph_async(
+                sequence,
+                verbose=verbose,
+                max_concurrency=max_concurrency,
+                max_workers=max_workers,
+                release=release,
+                keep=keep
+            )
+
+    # return full sequence for testing
+    return sequence + built
+
+
+class Backend:
+    """
+    Base class for stage 3 execution backends, used by build_workstation_graph() to build each
+    workstation once all of its suppliers are built.
+
+    Backends are used as context managers for the duration of stage 3. submit() must return a
+    concurrent.futures.Future, resolving to None if the workstation was built in place, or else
+    to the dict of built resources to be set as the workstation .resources.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return None
+
+    def submit(self, station: WorkStation):
+        """
+        Submit a workstation to be built.
+        :param station: workstation, with all suppliers built
+        :return: concurrent.futures.Future
+        """
+        raise NotImplementedError
+
+
+class ThreadBackend(Backend):
+    """
+    Build workstations in place in a thread pool.
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers
+        self.pool = None
+
+    def __enter__(self):
+        from concurrent.futures import ThreadPoolExecutor
+        self.pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        return self
+
+    def __exit__(self, *exc):
+        self.pool.shutdown()
+        self.pool = None
+
+    def submit(self, station: WorkStation):
+        return self.pool.submit(_build_station, station)
+
+
+class ProcessBackend(ThreadBackend):
+    """
+    Build workstations in a process pool, from a detached copy holding only supplier resources,
+    returning built resources.
+    """
+
+    def __enter__(self):
+        from concurrent.futures import ProcessPoolExecutor
+        self.pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self
+
+    def submit(self, station: WorkStation):
+        return self.pool.submit(_build_detached, _detach(station))
+
+
+EXECUTORS = {
+    'thread': ThreadBackend,
+    'process': ProcessBackend,
+}
+
+
+def _index_dependants(sequence: list) -> (dict, dict):
+    """
+    Helper function to count the distinct suppliers of each workstation and index the managers
+    depending on each supplier, for scheduling workstations once their suppliers are built.
+    :param sequence: list, of engaged workstations
+    :return: (dict {id(workstation): count}, dict {id(supplier): [workstations]})
+    """
+    waiting = {}
+    dependants = defaultdict(list)
+    for current in sequence:
+        suppliers = {id(supplier): supplier for supplier in current.suppliers or []}
+        waiting[id(current)] = len(suppliers)
+        for supplier in suppliers.values():
+            dependants[id(supplier)].append(current)
+    return waiting, dependants
+
+
+def _count_consumers(sequence: list) -> (dict, dict):
+    """
+    Helper function to resolve the supplier resources consumed by each workstation, where
+    suppliers sharing a key resolve to the last supplier (as in WorkStation.gather_resources()),
+    and count the consumers of each supplier resource.
+    :param sequence: list, of engaged workstations
+    :return: (dict {id(workstation): [(supplier, key)]}, dict {(id(supplier), key): count})
+    """
+    consumed = {id(station): [] for station in sequence}
+    counts = defaultdict(int)
+    for (station_id, _), pairs in _resolve_resource_suppliers(sequence).items():
+        consumed[station_id].extend(pairs)
+        for supplier, requirement in pairs:
+            counts[(id(supplier), requirement)] += 1
+    return consumed, counts
+
+
+def _resolve_resource_suppliers(sequence: list) -> dict:
+    """
+    Helper function to resolve the supplier resources required by each resource, where suppliers
+    sharing a key resolve to the last supplier (as in WorkStation.gather_resources()).
+    Requirements without a supplier resource are left out.
+    :param sequence: list, of engaged workstations
+    :return: dict, {(id(workstation), key): [(supplier, key)]}
+    """
+    dependencies = {}
+    for station in sequence:
+        providers = {}
+        for supplier in station.suppliers or []:
+            for key in supplier.resources:
+                providers[key] = supplier
+        for key, resource in station.resources.items():
+            pairs = dependencies[(id(station), key)] = []
+            for requirement in convert_to_unique_keys(resource.get_requirements()):
+                supplier = providers.get(requirement)
+                if supplier is not None:
+                    pairs.append((supplier, requirement))
+    return dependencies
+
+
+class _ReleaseTracker:
+    """
+    Helper counting down the consumers of supplier resources, removing a supplier resource from
+    its workstation .resources once all of its consumers are built (see build_workstation_graph()).
+
+    Tools may iterate live views of their supplier resources (see ResourceView) from other
+    threads, so removals from a supplier are deferred while any of its managers is being built.
+    """
+
+    def __init__(self, sequence: list, keep=None):
+        """
+        :param sequence: list, of engaged workstations
+        :param keep: optional iterable, of resource keys never to release
+        """
+        self.consumed, self.counts = _count_consumers(sequence)
+        self.keep = set(keep or [])
+        self.building = defaultdict(int)
+        self.pending = defaultdict(list)
+
+    def start(self, station: WorkStation) -> None:
+        """
+        Record that a workstation (or one of its resources) is being built.
+        :param station: workstation
+        :return: None
+        """
+        for supplier in station.suppliers or []:
+            self.building[id(supplier)] += 1
+
+    def done(self, station: WorkStation, consumed=None) -> None:
+        """
+        Record that a workstation (or one of its resources) is built, counting down the supplier
+        resources it consumed and removing those without remaining consumers, unless a manager
+        of their supplier is still being built.
+        :param station: workstation
+        :param consumed: optional list, of (supplier, key) consumed, defaults to all consumed by
+            the workstation
+        :return: None
+        """
+        for supplier, key in self.consumed[id(station)] if consumed is None else consumed:
+            self.counts[(id(supplier), key)] -= 1
+            if not self.counts[(id(supplier), key)] and key not in self.keep:
+                self.pending[id(supplier)].append(key)
+        for supplier in station.suppliers or []:
+            self.building[id(supplier)] -= 1
+        for supplier in station.suppliers or []:
+            if not self.building[id(supplier)]:
+                for key in self.pending.pop(id(supplier), []):
+                    supplier.resources.pop(key, None)
+
+
+class _SupplierResources:
+    """
+    Stand-in for a supplier workstation, holding only its built .resources.
+    """
+    def __init__(self, resources: dict):
+        self.resources = resources
+
+
+def _detach(station: WorkStation) -> WorkStation:
+    """
+    Helper function to make a shallow copy of a workstation that can be sent to a worker process
+    without the rest of the graph. Managers, executor and registry are dropped and suppliers are
+    replaced by their resources.
+    :param station: workstation
+    :return: workstation
+    """
+    detached = copy.copy(station)
+    detached.managers = None
+    detached.executor = None
+    detached.registry = None  # ie registries are not shared across processes
+    if station.suppliers:
+        detached.suppliers = [_SupplierResources(s.resources) for s in station.suppliers]
+    return detached
+
+
+def _build_tool(tool: Tool, resources: dict) -> Tool:
+    """
+    Build a tool (typically in a worker process) and return it.
+    :param tool: tool (or LazyTool)
+    :param resources: dict, of supplier resources
+    :return: tool
+    """
+    if isinstance(tool, LazyTool):
+        tool = tool.materialize()
+    _check_not_async(tool, tool.build(resources))
+    return tool
+
+
+def _check_not_async(tool: Tool, result) -> None:
+    """
+    Raise TypeError if a tool built synchronously returned a coroutine, ie has an async build()
+    that would otherwise never be awaited.
+    :param tool: tool
+    :param result: return value of tool.build()
+    :return: None
+    """
+    if result is None:  # ie as returned by most tools
+        return None
+    import inspect
+    if inspect.iscoroutine(result):
+        result.close()
+        raise TypeError(
+            f'Tool: {type(tool).__name__} has an async build(), use '
+            f'operate_workstation_graph_async() to await it.'
+        )
+
+
+def _build_station(station: WorkStation) -> None:
+    """
+    Build a workstation, recording an instrumentation span.
+    :param station: workstation
+    :return: None
+    """
+    with span('workstation', _station_name(station), depth=station.depth):
+        station.build()
+
+
+async def _build_station_async(station: WorkStation, limit, pool) -> None:
+    """
+    Build a workstation asynchronously (see WorkStation.build_async()), recording an
+    instrumentation span. Note that cpu and memory of interleaved async spans are not separable.
+    :param station: workstation
+    :param limit: optional asyncio.Semaphore, limiting concurrent tool builds
+    :param pool: optional concurrent.futures.ThreadPoolExecutor, for sync tools
+    :return: None
+    """
+    with span('workstation', _station_name(station), depth=station.depth):
+        await station.build_async(limit=limit, pool=pool)
+
+
+def _build_detached(station: WorkStation) -> dict:
+    """
+    Build a detached workstation (typically in a worker process) and return its resources.
+    :param station: workstation
+    :return: dict, built resources
+    """
+    _build_station(station)
+    return station.resources
+
+
+def replan_workstation_graph(start_node: WorkStation, verbose=False, build=True) -> dict:
+    """
+    Incrementally re-plan (and re-build) a previously operated graph, for example after a change
+    of config requirements.
+
+    Cached workstation requirements are invalidated and requirements are propagated through the
+    graph again, but existing resources are reused rather than initiated again, so that only
+    newly required resources are created. If build, only the created resources are built.
+
+    Note that resources that are no longer required are kept.
+
+    :param start_node: starting workstation
+    :param verbose: bool, verbose behaviour
+    :param build: bool, build created resources
+    :return: dict, {workstation: {'created': [keys], 'reused': [keys]}}
+    """
+    # stage 1:
+    existing = {}
+    for station in build_graph_depth(start_node):
+        existing[id(station)] = set(station.resources)
+    start_node.invalidate_requirements()
+
+    # stage 2:
+    sequence = engage_workstation_graph(start_node, verbose=verbose)
+    delta = {}
+    for station in sequence:
+        reused = existing[id(station)]
+        delta[station] = {
+            'created': [key for key in station.resources if key not in reused],
+            'reused': [key for key in station.resources if key in reused],
+        }
+
+    # stage 3:
+    if build:
+        for station in reversed(sequence):
+            created = delta[station]['created']
+            if created:
+                if verbose:
+                    print('BUILDING: ', station)
+                station.build_resources(created)
+
+    return delta
+
+
+def build_graph_depth(start_node: WorkStation, depth=0) -> list:
+    """
+    Function to record the longest path from the starting workstation to each supplier as
+    workstation .depth.
+
+    Iterative longest-path pass over the supplier graph in topological order, so that each
+    workstation and supplier edge is visited once. Raises ValueError if the graph contains a
+    circular dependency, or if it is deeper than the recursion limit (as requirements are
+    gathered recursively through managers).
+
+    :param start_node: starting workstation
+    :param depth: depth of starting workstation
+    :return: list, visited workstations in topological order
+    """
+    # gather reachable workstations and count incoming supplier edges
+    in_degree = {id(start_node): 0}
+    reachable = [start_node]
+    stack = [start_node]
+    while stack:
+        current = stack.pop()
+        for supplier in current.suppliers or []:
+            if id(supplier) not in in_degree:
+                in_degree[id(supplier)] = 0
+                reachable.append(supplier)
+                stack.append(supplier)
+            in_degree[id(supplier)] += 1
+
+    # relax longest paths in topological order
+    distances = {id(start_node): depth}
+    order = []
+    queue = deque(node for node in reachable if not in_degree[id(node)])
+    while queue:
+        current = queue.popleft()
+        order.append(current)
+        for supplier in current.suppliers or []:
+            distance = distances[id(current)] + 1
+            if distances.get(id(supplier), -1) < distance:
+                distances[id(supplier)] = distance
+            in_degree[id(supplier)] -= 1
+            if not in_degree[id(supplier)]:
+                queue.append(supplier)
+
+    if len(order) < len(reachable):
+        raise ValueError(
+            f'Circular dependency between workstations: {describe_path(find_cycle(start_node))}.'
+        )
+
+    max_depth = max(distances.values())
+    if max_depth >= sys.getrecursionlimit():
+        raise ValueError(
+            f'Supplier graph depth {max_depth} exceeds recursion limit '
+            f'{sys.getrecursionlimit()} at: {start_node}.'
+        )
+
+    for node in order:
+        if node is not start_node and node.depth < distances[id(node)]:
+            node.depth = distances[id(node)]
+
+    return order
+
+
+# tool classes resolved from import paths, see resolve_tool()
+_resolved_tools = {}
+
+
+def resolve_tool(tool) -> type:
+    """
+    Return tool class of a .tools registry entry: a tool class, an import path
+    ('package.module:Name' or 'package.module.Name', imported once) or an entry point (loaded).
+    :param tool: tool class, import path or entry point
+    :return: tool class
+    """
+    if isinstance(tool, str):
+        resolved = _resolved_tools.get(tool)
+        if resolved is None:
+            resolved = _resolved_tools[tool] = import_object(tool)
+        return resolved
+    if not isinstance(tool, type) and hasattr(tool, 'load'):  # ie importlib.metadata.EntryPoint
+        return tool.load()
+    return tool
+
+
+def tool_entry_points(group: str) -> dict:
+    """
+    Return a lazy tools registry {name: entry point} of the entry points of a group, eg as
+    declared in package metadata under [project.entry-points."<group>"]. Tools are only loaded
+    when required.
+    :param group: str, entry point group
+    :return: dict
+    """
+    from importlib.metadata import entry_points
+    return {entry_point.name: entry_point for entry_point in entry_points(group=group)}
+
+
+def import_object(path: str):
+    """
+    Import and return an object from its import path, 'package.module:Name' or
+    'package.module.Name'.
+    :param path: str, import path
+    :return: object
+    """
+    if ':' in path:
+        module_name, _, name = path.partition(':')
+    else:
+        module_name, _, name = path.rpartition('.')
+    if not module_name:
+        raise ValueError(f'Invalid import path: {path}')
+    obj = importlib.import_module(module_name)
+    for attribute in name.split('.'):
+        obj = getattr(obj, attribute)
+    return obj
+
+
+def object_path(obj) -> str:
+    """
+    Return import path 'package.module:Name' of a class or function, see import_object().
+    :param obj: class or function
+    :return: str
+    """
+    return f'{obj.__module__}:{obj.__qualname__}'
+
+
+def find_cycle(start_node: WorkStation):
+    """
+    Return a circular dependency reachable from the starting workstation, as the path of
+    workstations along supplier edges from the first workstation of the cycle back to itself,
+    or None if there is no cycle. Iterative depth-first search, visiting each workstation and
+    supplier edge once.
+    :param start_node: starting workstation
+    :return: list, of workstations, or None
+    """
+    # id: 1 while on the current path, 2 once all suppliers are explored
+    state = {id(start_node): 1}
+    path = [start_node]
+    stack = [iter(start_node.suppliers or [])]
+    while stack:
+        supplier = next(stack[-1], None)
+        if supplier is None:
+            state[id(path.pop())] = 2
+            stack.pop()
+            continue
+        if state.get(id(supplier)) == 1:
+            start = next(i for i, node in enumerate(path) if node is supplier)
+            return path[start:] + [supplier]
+        if id(supplier) not in state:
+            state[id(supplier)] = 1
+            path.append(supplier)
+            stack.append(iter(supplier.suppliers or []))
+    return None
+
+
+def describe_path(path: list) -> str:
+    """
+    Return readable path of workstations, eg 'StartProcess -> PostProcess'.
+    :param path: list, of workstations
+    :return: str
+    """
+    return ' -> '.join(type(node).__name__ for node in path or [])
+
+
+def station_names(sequence: list) -> dict:
+    """
+    Return readable names of workstations, {id(workstation): name}, using their .label if set,
+    else class names, suffixed with their position in the sequence where a class is used more
+    than once.
+    :param sequence: list, of workstations
+    :return: dict
+    """
+    counts = Counter(type(station).__name__ for station in sequence if not station.label)
+    names = {}
+    for i, station in enumerate(sequence):
+        name = station.label or type(station).__name__
+        names[id(station)] = name if station.label or counts[name] == 1 else f'{name}[{i}]'
+    return names
+
+
+def _station_name(station: WorkStation) -> str:
+    """
+    Return name of a workstation in instrumentation spans: its .label if set, else as named by
+    the last run (see station_names()), else its class name.
+    :param station: workstation
+    :return: str
+    """
+    return station.label or station._name or type(station).__name__
+
+
+def supplier_graph(start_node: WorkStation) -> list:
+    """
+    Return all workstations supplying the starting workstation, directly or indirectly,
+    including the starting workstation.
+    :param start_node: starting workstation
+    :return: list, of workstations
+    """
+    stations = [start_node]
+    visited = {id(start_node)}
+    stack = [start_node]
+    while stack:
+        current = stack.pop()
+        for supplier in current.suppliers or []:
+            if id(supplier) not in visited:
+                visited.add(id(supplier))
+                stations.append(supplier)
+                stack.append(supplier)
+    return stations
+
+
+def requirements_cache_info(start_node: WorkStation) -> dict:
+    """
+    Return requirements planning cache hits and misses, summed over all workstations supplying
+    the starting workstation (inclusive).
+    :param start_node: starting workstation
+    :return: dict, {'hits': int, 'misses': int}
+    """
+    info = {'hits': 0, 'misses': 0}
+    for station in supplier_graph(start_node):
+        info['hits'] += station.requirements_hits
+        info['misses'] += station.requirements_misses
+    return info
+
+
 def order_by_distance(candidates: list) -> list:
     """
     Returns candidate list ordered by .depth.
@@ -297,26 +1718,12 @@ def combine_reqs(reqs: list) -> dict:
     Note that no requirements are returned as an empty dict.
 
     Note that no options are returned as None ie {requirment: None}
+
+    Merges through a RequirementSet, see factory.requirements.
     :param reqs: list of dicts of lists
     :return: dict, of requirements
     """
-    if not reqs:
-        return {}
-    tool_set = set()
-    for req in reqs:
-        if req:
-            tool_set.update(list(req))
-    combined_reqs = {}
-    for tool in tool_set:
-        options = set()
-        for req in reqs:
-            if req.get(tool):
-                options.update(req[tool])
-        if options:
-            combined_reqs[tool] = list(options)
-        else:
-            combined_reqs[tool] = None
-    return combined_reqs
+    return RequirementSet.union(reqs).to_dict()
 
 
 def convert_to_unique_keys(d: dict) -> list:
@@ -338,7 +1745,7 @@ def convert_to_unique_keys(d: dict) -> list:
             keys.append(name)
             continue
         for option in options:
-            keys.append(f'{name}:{option}')
+            keys.append(unique_key(name, option))
     return keys
 
 
@@ -0,0 +1,199 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# registered listeners, see add_listener()
+_listeners = []
+_local = threading.local()
+
+
+def add_listener(listener) -> None:
+    """
+    Register a listener to receive a record of every instrumented span, via
+    listener.record(record). Records are dicts of:
+    category ('stage', 'workstation' or 'tool'), name, start (perf counter seconds), wall (s),
+    cpu (thread cpu seconds), peak_memory (bytes above span start, or None if tracemalloc is not
+    tracing), pid, tid and args.
+    :param listener: object with a record(dict) method
+    :return: None
+    """
+    if listener not in _listeners:
+        _listeners.append(listener)
+
+
+def remove_listener(listener) -> None:
+    """
+    Unregister a listener.
+    :param listener: registered listener
+    :return: None
+    """
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+
+@contextmanager
+def span(category: str, name: str, **args):
+    """
+    Context manager measuring wall time, cpu time and (if tracemalloc is tracing) peak memory of
+    its body and passing the record to all listeners. Does nothing if there are no listeners.
+
+    Note that peak memory is traced process wide, so concurrent spans see each other's
+    allocations.
+    :param category: str, span category
+    :param name: str, span name
+    :param args: extra details to record
+    """
+    if not _listeners:
+        yield
+        return
+
+    import tracemalloc  # ie only when profiling, as tracemalloc and json are slow to import
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        stack = _memory_stack()
+        current, peak = tracemalloc.get_traced_memory()
+        if stack:
+            stack[-1][1] = max(stack[-1][1], peak)
+        tracemalloc.reset_peak()
+        stack.append([current, current])
+
+    start, cpu = time.perf_counter(), time.thread_time()
+    try:
+        yield
+    finally:
+        wall, cpu = time.perf_counter() - start, time.thread_time() - cpu
+        peak_memory = None
+        if tracing:
+            _, peak = tracemalloc.get_traced_memory()
+            base, inner_peak = stack.pop()
+            peak = max(peak, inner_peak)
+            peak_memory = peak - base
+            if stack:
+                stack[-1][1] = max(stack[-1][1], peak)
+        record = {
+            'category': category,
+            'name': name,
+            'start': start,
+            'wall': wall,
+            'cpu': cpu,
+            'peak_memory': peak_memory,
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+            'args': args,
+        }
+        for listener in list(_listeners):
+            listener.record(record)
+
+
+def _memory_stack() -> list:
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+
+class Profiler:
+    """
+    Listener collecting records of stage, workstation and tool spans, for export as JSON or as a
+    Chrome trace (chrome://tracing or Perfetto).
+
+    Use as a context manager to register (and optionally trace memory) for its duration:
+
+        with Profiler(memory=True) as profiler:
+            operate_workstation_graph(start)
+        profiler.to_chrome_trace('trace.json')
+
+    Note that spans are recorded in the process running them, so tools and workstations built in
+    worker processes are not recorded.
+    """
+
+    def __init__(self, memory=False):
+        """
+        :param memory: bool, trace peak memory with tracemalloc (slows allocation heavy tools)
+        """
+        self.memory = memory
+        self.records = []
+        self._started_tracing = False
+
+    def record(self, record: dict) -> None:
+        self.records.append(record)
+
+    def __enter__(self):
+        import tracemalloc
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        add_listener(self)
+        return self
+
+    def __exit__(self, *exc):
+        import tracemalloc
+        remove_listener(self)
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def summary(self, category=None) -> list:
+        """
+        Return records (optionally of one category), slowest first.
+        :param category: optional str, category
+        :return: list, of records
+        """
+        records = [r for r in self.records if category is None or r['category'] == category]
+        return sorted(records, key=lambda r: r['wall'], reverse=True)
+
+    def tool_costs(self) -> dict:
+        """
+        Return mean wall time of recorded tool builds, keyed by 'workstation/key', for use as
+        historical costs of a build plan (see factory.plan).
+        :return: dict, {label: seconds}
+        """
+        walls = {}
+        for r in self.records:
+            if r['category'] == 'tool':
+                walls.setdefault(f"{r['args']['workstation']}/{r['name']}", []).append(r['wall'])
+        return {label: sum(times) / len(times) for label, times in walls.items()}
+
+    def to_json(self, path=None) -> str:
+        """
+        Return records as JSON, optionally also writing to path.
+        :param path: optional str, path
+        :return: str
+        """
+        import json
+        data = json.dumps(self.records, indent=2, default=str)
+        if path:
+            with open(path, 'w') as f:
+                f.write(data)
+        return data
+
+    def to_chrome_trace(self, path=None) -> dict:
+        """
+        Return records as a Chrome trace event dict of complete events, optionally also writing
+        to path.
+        :param path: optional str, path
+        :return: dict
+        """
+        origin = min((r['start'] for r in self.records), default=0)
+        events = []
+        for r in self.records:
+            args = {key: str(value) for key, value in r['args'].items()}
+            args['cpu_ms'] = r['cpu'] * 1e3
+            if r['peak_memory'] is not None:
+                args['peak_memory'] = r['peak_memory']
+            events.append({
+                'name': r['name'],
+                'cat': r['category'],
+                'ph': 'X',
+                'ts': (r['start'] - origin) * 1e6,
+                'dur': r['wall'] * 1e6,
+                'pid': r['pid'],
+                'tid': r['tid'],
+                'args': args,
+            })
+        trace = {'traceEvents': events, 'displayTimeUnit': 'ms'}
+        if path:
+            import json
+            with open(path, 'w') as f:
+                json.dump(trace, f)
+        return trace
@@ -0,0 +1,273 @@
+from collections import deque
+
+from factory.factory import WorkStation, build_graph_depth, engage_workstation_graph
+from factory.factory import convert_to_unique_keys, resolve_tool, station_names, supplier_graph
+from factory.requirements import RequirementSet, unique_key
+
+
+def resource_graph(sequence: list, names=None) -> (dict, dict, list):
+    """
+    Resolve the resource level DAG of engaged workstations. Nodes are labelled
+    'workstation/key', and each resource depends on the supplier resources matching the unique
+    keys of its requirements. As in WorkStation.gather_resources(), where suppliers share a key
+    the last supplier is used.
+    :param sequence: list, of engaged workstations
+    :param names: optional dict, {id(workstation): name}, defaults to station_names(sequence)
+    :return: (nodes {label: {'workstation', 'key', 'tool'}}, suppliers {label: [labels]},
+        missing [(label, requirement)])
+    """
+    names = names or station_names(sequence)
+    labels = {}
+    nodes = {}
+    for station in sequence:
+        for key, resource in station.resources.items():
+            label = f'{names[id(station)]}/{key}'
+            labels[(id(station), key)] = label
+            nodes[label] = {'workstation': station, 'key': key, 'tool': resource}
+
+    suppliers = {}
+    missing = []
+    for station in sequence:
+        available = {}
+        for supplier in station.suppliers or []:
+            for key in supplier.resources:
+                available[key] = labels[(id(supplier), key)]
+        for key, resource in station.resources.items():
+            label = labels[(id(station), key)]
+            requirements = []
+            if hasattr(resource, 'get_requirements'):
+                requirements = convert_to_unique_keys(resource.get_requirements())
+            suppliers[label] = []
+            for requirement in requirements:
+                if requirement in available:
+                    suppliers[label].append(available[requirement])
+                else:
+                    missing.append((label, requirement))
+    return nodes, suppliers, missing
+
+
+class BuildPlan:
+    """
+    Build plan of an engaged workstation graph: the resolved resource level DAG with a build cost
+    for every resource, its critical path, parallelism per level and total work.
+
+    Levels group resources by the longest chain of supplier resources below them, so that all
+    resources of a level can be built at the same time once lower levels are built.
+    """
+
+    def __init__(self, nodes: dict, suppliers: dict, costs: dict, missing=None):
+        """
+        :param nodes: dict, {label: {'workstation', 'key', 'tool'}}
+        :param suppliers: dict, {label: [supplier labels]}
+        :param costs: dict, {label: cost}
+        :param missing: optional list, of unresolved (label, requirement)
+        """
+        self.nodes = nodes
+        self.suppliers = suppliers
+        self.costs = costs
+        self.missing = missing or []
+
+        managers = {label: [] for label in nodes}
+        waiting = {}
+        for label, node_suppliers in suppliers.items():
+            waiting[label] = len(node_suppliers)
+            for supplier in node_suppliers:
+                managers[supplier].append(label)
+
+        # earliest finish and level in topological order
+        self.order = []
+        self.finish = {}
+        self.level = {}
+        self._slowest = {}
+        queue = deque(label for label in nodes if not waiting[label])
+        while queue:
+            label = queue.popleft()
+            self.order.append(label)
+            level, slowest = 0, None
+            for supplier in suppliers[label]:
+                if slowest is None or self.finish[supplier] > self.finish[slowest]:
+                    slowest = supplier
+                level = max(level, self.level[supplier] + 1)
+            start = self.finish[slowest] if slowest is not None else 0.0
+            self.finish[label] = start + costs[label]
+            self.level[label] = level
+            self._slowest[label] = slowest
+            for manager in managers[label]:
+                waiting[manager] -= 1
+                if not waiting[manager]:
+                    queue.append(manager)
+
+        if len(self.order) < len(nodes):
+            raise ValueError('Circular dependency between resources.')
+
+    @property
+    def total_work(self) -> float:
+        """
+        Sum of all resource build costs.
+        :return: float
+        """
+        return sum(self.costs.values())
+
+    @property
+    def critical_path(self) -> list:
+        """
+        Chain of resources with the greatest total cost, from first built to last.
+        :return: list, of labels
+        """
+        if not self.finish:
+            return []
+        label = max(self.order, key=lambda x: self.finish[x])
+        path = []
+        while label is not None:
+            path.append(label)
+            label = self._slowest[label]
+        return path[::-1]
+
+    @property
+    def critical_path_cost(self) -> float:
+        """
+        Total cost of the critical path, ie the shortest possible build time.
+        :return: float
+        """
+        return max(self.finish.values(), default=0.0)
+
+    @property
+    def levels(self) -> list:
+        """
+        Resources grouped by level, from resources without suppliers upwards.
+        :return: list, of lists of labels
+        """
+        levels = [[] for _ in range(max(self.level.values(), default=-1) + 1)]
+        for label in self.order:
+            levels[self.level[label]].append(label)
+        return levels
+
+    @property
+    def max_parallelism(self) -> int:
+        """
+        Greatest number of resources in a level.
+        :return: int
+        """
+        return max((len(level) for level in self.levels), default=0)
+
+    def report(self) -> str:
+        """
+        Return readable summary of the plan.
+        :return: str
+        """
+        lines = [
+            f'resources: {len(self.nodes)}',
+            f'total work: {self.total_work:.3f}',
+            f'critical path cost: {self.critical_path_cost:.3f}',
+            f'average parallelism: {self.total_work / (self.critical_path_cost or 1):.2f}',
+            f'max parallelism: {self.max_parallelism}',
+            'parallelism per level:',
+        ]
+        for i, level in enumerate(self.levels):
+            work = sum(self.costs[label] for label in level)
+            lines.append(f'\t{i}: {len(level)} resources, work {work:.3f}')
+        lines.append('critical path:')
+        for label in self.critical_path:
+            lines.append(f'\t{label} ({self.costs[label]:.3f})')
+        for label, requirement in self.missing:
+            lines.append(f'missing: {requirement} for {label}')
+        return '\n'.join(lines)
+
+
+def plan_workstation_graph(
+        start_node: WorkStation,
+        costs=None,
+        default_cost=1.0,
+        engage=True
+) -> BuildPlan:
+    """
+    Return build plan of the resource level DAG of a workstation graph, without building.
+
+    Costs of resources are looked up in costs by label ('workstation/key', as from
+    factory.instrument.Profiler.tool_costs()), then by key ('tool:option'), else default_cost is
+    used. Costs may also be given as a function of (workstation, key, tool).
+
+    :param start_node: starting workstation
+    :param costs: optional dict or callable, of build costs
+    :param default_cost: float, estimated cost of resources without known cost
+    :param engage: bool, run stages 1 and 2 first (otherwise the graph must already be engaged)
+    :return: BuildPlan
+    """
+    if engage:
+        build_graph_depth(start_node)
+        sequence = engage_workstation_graph(start_node)
+    else:
+        sequence = build_graph_depth(start_node)
+    # named as labelled by operate_workstation_graph(), to match profiled tool costs
+    names = station_names(supplier_graph(start_node))
+    nodes, suppliers, missing = resource_graph(sequence, names)
+
+    resolved = {}
+    for label, node in nodes.items():
+        if callable(costs):
+            resolved[label] = costs(node['workstation'], node['key'], node['tool'])
+        elif costs:
+            resolved[label] = costs.get(label, costs.get(node['key'], default_cost))
+        else:
+            resolved[label] = default_cost
+    return BuildPlan(nodes, suppliers, resolved, missing)
+
+
+def dry_run_workstation_graph(start_node: WorkStation) -> dict:
+    """
+    Plan-only mode: resolve the resources and requirements of every workstation as stage 2 would,
+    but from class-level tool metadata (Tool.requirements_for()) without initiating any tool,
+    and without changing workstation resources or requirements.
+
+    Missing supplier tools and unsupported options are reported rather than raised.
+
+    :param start_node: starting workstation
+    :return: dict, {
+        'order': [workstations, managers before suppliers],
+        'resources': {workstation: {key: tool class}},
+        'requirements': {workstation: {req: [options]}},
+        'missing': [(workstation, [missing tool names])],
+        'invalid': [(workstation, key, message)],
+        }
+    """
+    order = build_graph_depth(start_node)
+    resources = {station: {} for station in order}
+    requirements = {station: RequirementSet() for station in order}
+    requirements[start_node].update(start_node.config.get_requirements())
+    missing = []
+    invalid = []
+
+    for station in order:
+        if not station.suppliers:
+            continue
+        station_requirements = requirements[station].to_dict()
+
+        supplier_tools = set()
+        for supplier in station.suppliers:
+            supplier_tools.update(supplier.tools or {})
+        absent = set(station_requirements) - supplier_tools
+        if absent:
+            missing.append((station, sorted(absent)))
+
+        for supplier in station.suppliers:
+            for tool_name, tool in (supplier.tools or {}).items():
+                if not tool or tool_name not in station_requirements:
+                    continue
+                for option in station_requirements[tool_name] or [None]:
+                    key = unique_key(tool_name, option)
+                    if key in resources[supplier]:
+                        continue
+                    try:
+                        requirements[supplier].update(resolve_tool(tool).requirements_for(option))
+                    except UserWarning as error:
+                        invalid.append((supplier, key, str(error)))
+                        continue
+                    resources[supplier][key] = tool
+
+    return {
+        'order': order,
+        'resources': resources,
+        'requirements': {station: reqs.to_dict() for station, reqs in requirements.items()},
+        'missing': missing,
+        'invalid': invalid,
+    }
@@ -0,0 +1,154 @@
+import itertools
+import threading
+import weakref
+
+from factory.factory import convert_to_unique_keys
+
+
+class ResourceRegistry:
+    """
+    Factory-wide registry of built resources, so that equivalent tools needed at several
+    workstations are built once and shared.
+
+    Tools are equivalent if they have the same tool class, option and resolved requirements,
+    ie the same supplier resource objects for each requirement. As shared resources are
+    themselves registered, equivalence is recognised transitively through the graph, whatever the
+    keys or workstations of the tools (eg a GetPath tool serving several path keys).
+
+    Set as the .registry of workstations (see operate_workstation_graph()). Tools are shared
+    when built serially, with thread executors or asynchronously (see share_async()), but not
+    across worker processes. The registry holds weak references where
+    possible, so that released resources can still be freed.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._building = {}
+        self._tokens = weakref.WeakKeyDictionary()
+        self._strong = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def key(self, tool, resources) -> tuple:
+        """
+        Return registry key of tool given supplier resources.
+        :param tool: tool (or LazyTool)
+        :param resources: mapping, of supplier resources
+        :return: tuple
+        """
+        tool_class = getattr(tool, 'tool_class', type(tool))  # ie LazyTool
+        requirements = sorted(convert_to_unique_keys(tool.get_requirements()))
+        suppliers = tuple(
+            (requirement, self._token(resources[requirement]) if requirement in resources else None)
+            for requirement in requirements
+        )
+        return tool_class, repr(tool.option), suppliers
+
+    def share(self, tool, resources, build):
+        """
+        Return the registered equivalent of tool, waiting for it if it is being built elsewhere,
+        or else build tool with build() and register the result.
+        :param tool: tool (or LazyTool)
+        :param resources: mapping, of supplier resources
+        :param build: callable, building tool and returning it
+        :return: built tool
+        """
+        key = self.key(tool, resources)
+        shared, event = self._claim(key)
+        while event is not None:
+            event.wait()  # ie retry once the building thread registers or fails
+            shared, event = self._claim(key)
+        if shared is not None:
+            return shared
+
+        built = None
+        try:
+            built = build()
+            return built
+        finally:
+            self._register(key, built)
+
+    async def share_async(self, tool, resources, build):
+        """
+        Async counterpart of share(), for tools with an async build(). Equivalent builds
+        elsewhere are waited for without blocking the event loop.
+        :param tool: tool (or LazyTool)
+        :param resources: mapping, of supplier resources
+        :param build: callable, returning an awaitable building tool and returning it
+        :return: built tool
+        """
+        import asyncio
+
+        key = self.key(tool, resources)
+        shared, event = self._claim(key)
+        while event is not None:
+            await asyncio.get_running_loop().run_in_executor(None, event.wait)
+            shared, event = self._claim(key)
+        if shared is not None:
+            return shared
+
+        built = None
+        try:
+            built = await build()
+            return built
+        finally:
+            self._register(key, built)
+
+    def _claim(self, key: tuple):
+        """
+        Return (registered tool, None) if registered, (None, event) if being built elsewhere, or
+        else (None, None), claiming the build.
+        """
+        with self._lock:
+            shared = self._lookup(key)
+            if shared is not None:
+                self.hits += 1
+                return shared, None
+            event = self._building.get(key)
+            if event is None:
+                self.misses += 1
+                self._building[key] = threading.Event()
+            return None, event
+
+    def _register(self, key: tuple, built) -> None:
+        """
+        Register a claimed build (unless it failed) and wake any waiting equivalent builds.
+        """
+        with self._lock:
+            if built is not None:
+                self._entries[key] = self._reference(built)
+            event = self._building.pop(key)
+        event.set()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(1 for key in self._entries if self._lookup(key) is not None)
+
+    def _lookup(self, key):
+        reference = self._entries.get(key)
+        if reference is None:
+            return None
+        return reference()
+
+    def _reference(self, resource):
+        try:
+            return weakref.ref(resource)
+        except TypeError:
+            return lambda: resource
+
+    def _token(self, resource) -> int:
+        """
+        Return identity token of a resource, never reused for another object (unlike id()).
+        """
+        try:
+            token = self._tokens.get(resource)
+            if token is None:
+                token = self._tokens[resource] = next(self._counter)
+            return token
+        except TypeError:  # ie cannot be weakly referenced, so keep alive by id
+            entry = self._strong.get(id(resource))
+            if entry is None or entry[0] is not resource:
+                entry = self._strong[id(resource)] = (resource, next(self._counter))
+            return entry[1]
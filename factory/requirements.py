@@ -0,0 +1,139 @@
+import sys
+
+# interned requirement keys, shared by all requirement sets
+_requirement_keys = {}
+_unique_keys = {}
+
+
+def requirement_key(tool: str, option=None) -> tuple:
+    """
+    Return interned (tool, option) requirement key, so that equal keys share one tuple.
+    :param tool: str, tool name
+    :param option: optional option
+    :return: tuple
+    """
+    key = (tool, option)
+    return _requirement_keys.setdefault(key, key)
+
+
+def unique_key(tool: str, option=None) -> str:
+    """
+    Return interned unique resource key 'tool:option', or 'tool' if option is None. The string
+    is only built the first time a (tool, option) pair is seen.
+    :param tool: str, tool name
+    :param option: optional option
+    :return: str
+    """
+    try:
+        return _unique_keys[tool][option]
+    except KeyError:
+        key = tool if option is None else sys.intern(f'{tool}:{option}')
+        _unique_keys.setdefault(tool, {})[option] = key
+        return key
+
+
+class RequirementSet:
+    """
+    Compact set of requirements, held as interned (tool, option) keys, where option is None for
+    a requirement without options. Keys keep the order in which they were first added.
+
+    Convert to and from the requirements dict format {req: [options]} with to_dict() and
+    from_dict(). As with combine_reqs(), a requirement with options drops any None option.
+    """
+    __slots__ = ('_keys',)
+
+    def __init__(self, keys=None):
+        """
+        :param keys: optional iterable, of (tool, option) keys
+        """
+        self._keys = {}
+        if keys:
+            for tool, option in keys:
+                self._keys[requirement_key(tool, option)] = None
+
+    @classmethod
+    def from_dict(cls, requirements: dict) -> 'RequirementSet':
+        """
+        Return requirement set from requirements dict {req: [options]}.
+        :param requirements: dict, of requirements
+        :return: RequirementSet
+        """
+        return cls().update(requirements)
+
+    @classmethod
+    def union(cls, reqs: list) -> 'RequirementSet':
+        """
+        Return union of a list of requirement sets and/or requirements dicts.
+        :param reqs: list, of RequirementSets or dicts
+        :return: RequirementSet
+        """
+        combined = cls()
+        for req in reqs:
+            combined.update(req)
+        return combined
+
+    def update(self, other) -> 'RequirementSet':
+        """
+        Merge another requirement set or requirements dict into this set, in place.
+        :param other: RequirementSet or dict (or None)
+        :return: RequirementSet, self
+        """
+        if not other:
+            return self
+        if isinstance(other, RequirementSet):
+            self._keys.update(other._keys)
+            return self
+        keys = self._keys
+        for tool, options in other.items():
+            if not options:
+                keys[requirement_key(tool)] = None
+                continue
+            for option in options:
+                keys[requirement_key(tool, option)] = None
+        return self
+
+    def to_dict(self) -> dict:
+        """
+        Return requirements dict {req: [options]}, with None for requirements without options.
+        :return: dict
+        """
+        requirements = {}
+        for tool, option in self._keys:
+            options = requirements.get(tool)
+            if option is None:
+                requirements.setdefault(tool, None)
+            elif options is None:
+                requirements[tool] = [option]
+            else:
+                options.append(option)
+        return requirements
+
+    def unique_keys(self) -> list:
+        """
+        Return list of unique resource keys, as convert_to_unique_keys().
+        :return: list
+        """
+        with_options = {tool for tool, option in self._keys if option is not None}
+        return [
+            unique_key(tool, option) for tool, option in self._keys
+            if option is not None or tool not in with_options
+        ]
+
+    def __contains__(self, key) -> bool:
+        return key in self._keys
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, dict):
+            other = RequirementSet.from_dict(other)
+        if not isinstance(other, RequirementSet):
+            return NotImplemented
+        return set(self.unique_keys()) == set(other.unique_keys())
+
+    def __repr__(self) -> str:
+        return f'RequirementSet({self.to_dict()})'
@@ -0,0 +1,292 @@
+import hashlib
+import json
+import os
+from types import MappingProxyType
+
+from factory.factory import LazyTool, WorkStation, build_graph_depth, build_workstation_graph
+from factory.factory import engage_workstation_graph, import_object, object_path, resolve_tool
+from factory.factory import supplier_graph
+from factory.instrument import span
+
+try:
+    import yaml
+except ImportError:  # optional, for .yaml specs
+    yaml = None
+
+try:
+    import tomllib
+except ImportError:  # python < 3.11, optional, for .toml specs
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+
+def load_spec(path: str) -> dict:
+    """
+    Load a declarative factory spec from a YAML, JSON or TOML file (by extension):
+
+        start: start
+        requirements: {vkt: [bus], volume_counts: [car]}
+        stations:
+          start: {class: elara_example:StartProcess, suppliers: [post, handler]}
+          post: {class: elara_example:PostProcess, suppliers: [handler]}
+          handler:
+            class: elara_example:HandlerProcess
+            tools: {volume_counts: elara_example:VolumeCounts}
+            suppliers: [inputs]
+          ...
+
+    Stations are given by import path of a WorkStation class (default WorkStation), optionally
+    with their own registry of tool import paths, and by the names of their suppliers. Managers
+    are derived from suppliers.
+    :param path: str, spec path
+    :return: dict, spec
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.yaml', '.yml'):
+        if yaml is None:
+            raise ImportError('PyYAML is required to load YAML specs.')
+        with open(path) as f:
+            return yaml.safe_load(f)
+    if extension == '.toml':
+        if tomllib is None:
+            raise ImportError('tomllib (or tomli) is required to load TOML specs.')
+        with open(path, 'rb') as f:
+            return tomllib.load(f)
+    if extension == '.json':
+        with open(path) as f:
+            return json.load(f)
+    raise ValueError(f'Unsupported spec format: {extension}, expected .yaml, .json or .toml.')
+
+
+def spec_fingerprint(spec: dict) -> str:
+    """
+    Return fingerprint of a spec, independent of key order.
+    :param spec: dict, spec
+    :return: str
+    """
+    return hashlib.sha256(json.dumps(spec, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class SpecConfig:
+    """
+    Config of a graph built from a spec, returning the spec requirements.
+    """
+
+    def __init__(self, requirements: dict):
+        self.requirements = requirements
+
+    def get_requirements(self) -> dict:
+        return {req: None if options is None else list(options)
+                for req, options in self.requirements.items()}
+
+
+def build_spec_graph(spec: dict) -> (WorkStation, dict):
+    """
+    Initiate and connect the workstations of a spec. Raise ValueError for unknown station names.
+    :param spec: dict, spec
+    :return: (starting workstation, {name: workstation})
+    """
+    config = SpecConfig(spec.get('requirements') or {})
+    entries = spec['stations']
+    stations = {}
+    for name, entry in entries.items():
+        entry = entry or {}
+        station = import_object(entry.get('class', object_path(WorkStation)))(config)
+        if entry.get('tools') is not None:
+            station.tools = dict(entry['tools'])  # ie import paths, see resolve_tool()
+        stations[name] = station
+    suppliers = {name: (entry or {}).get('suppliers') or [] for name, entry in entries.items()}
+    _connect(stations, suppliers)
+    if spec['start'] not in stations:
+        raise ValueError(f"Unknown start station: {spec['start']}")
+    return stations[spec['start']], stations
+
+
+def _connect(stations: dict, suppliers: dict) -> None:
+    """
+    Connect workstations given their supplier names, deriving managers.
+    """
+    managers = {name: [] for name in stations}
+    for name, names in suppliers.items():
+        for supplier in names:
+            if supplier not in stations:
+                raise ValueError(f'Unknown supplier: {supplier} of station: {name}')
+            managers[supplier].append(stations[name])
+    for name, station in stations.items():
+        station.connect(
+            managers[name] or None,
+            [stations[supplier] for supplier in suppliers[name]] or None
+        )
+
+
+class CompiledPlan:
+    """
+    Immutable, precomputed plan of a spec: the result of stages 1 and 2 (workstation depths,
+    stage 2 order, requirements and resource keys with their tool classes and requirements),
+    serializable as JSON.
+
+    instantiate() recreates the engaged graph directly from the plan, so that repeated runs of
+    the same pipeline skip planning and start building at once (see operate_compiled_plan()).
+    """
+    __slots__ = ('_data',)
+
+    def __init__(self, data: dict):
+        """
+        :param data: dict, as from to_dict()
+        """
+        self._data = json.loads(json.dumps(data))
+
+    @property
+    def fingerprint(self) -> str:
+        return self._data['fingerprint']
+
+    @property
+    def start(self) -> str:
+        return self._data['start']
+
+    @property
+    def order(self) -> tuple:
+        """
+        Stage 2 order of workstation names.
+        """
+        return tuple(self._data['order'])
+
+    @property
+    def depths(self) -> MappingProxyType:
+        return MappingProxyType({name: s['depth'] for name, s in self._data['stations'].items()})
+
+    @property
+    def resource_keys(self) -> MappingProxyType:
+        return MappingProxyType({
+            name: tuple(key for key, _, _, _ in s['resources'])
+            for name, s in self._data['stations'].items()
+        })
+
+    def to_dict(self) -> dict:
+        return json.loads(json.dumps(self._data))
+
+    def save(self, path: str) -> None:
+        """
+        Write plan as JSON.
+        :param path: str, path
+        :return: None
+        """
+        temp = f'{path}.{os.getpid()}.tmp'
+        with open(temp, 'w') as f:
+            json.dump(self._data, f, indent=2)
+        os.replace(temp, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'CompiledPlan':
+        """
+        Read plan from JSON.
+        :param path: str, path
+        :return: CompiledPlan
+        """
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def instantiate(self, lazy=True) -> (WorkStation, list):
+        """
+        Initiate and connect workstations with the resources and requirements of the plan, as
+        after stage 2, without planning. If lazy, resources are LazyTool handles using the
+        planned requirements, so that no tool is imported or initiated before it is built.
+        :param lazy: bool, hold resources as LazyTool handles
+        :return: (starting workstation, stage 2 sequence of workstations)
+        """
+        config = SpecConfig(self._data['requirements'])
+        stations = {}
+        for name, entry in self._data['stations'].items():
+            station = import_object(entry['class'])(config)
+            if entry['tools'] is not None:
+                station.tools = dict(entry['tools'])
+            station.depth = entry['depth']
+            station.lazy = lazy
+            for key, tool_path, option, requirements in entry['resources']:
+                if lazy:  # ie tools are only imported when built
+                    station.resources[key] = LazyTool(tool_path, option, requirements)
+                else:
+                    station.resources[key] = resolve_tool(tool_path)(option)
+            if entry['requirements'] is not None:
+                station.requirements = entry['requirements']
+                station.requirements_cached = True
+            stations[name] = station
+        _connect(stations, {name: s['suppliers'] for name, s in self._data['stations'].items()})
+        return stations[self.start], [stations[name] for name in self.order]
+
+
+def compile_spec(spec: dict) -> CompiledPlan:
+    """
+    Compile a spec into a plan, running stages 1 and 2 with lazy tools.
+    :param spec: dict, spec
+    :return: CompiledPlan
+    """
+    start, stations = build_spec_graph(spec)
+    names = {id(station): name for name, station in stations.items()}
+    build_graph_depth(start)
+    for station in supplier_graph(start):
+        station.lazy = True
+    sequence = engage_workstation_graph(start)
+
+    entries = {}
+    engaged = {id(station) for station in sequence}
+    for name, station in stations.items():
+        entry = spec['stations'][name] or {}
+        entries[name] = {
+            'class': object_path(type(station)),
+            'tools': entry.get('tools'),
+            'suppliers': [names[id(supplier)] for supplier in station.suppliers or []],
+            'depth': station.depth,
+            'requirements': station.requirements if station.requirements_cached else None,
+            'resources': [
+                [key, object_path(tool.tool_class), tool.option, tool.get_requirements() or {}]
+                for key, tool in station.resources.items()
+            ] if id(station) in engaged else [],
+        }
+    return CompiledPlan({
+        'fingerprint': spec_fingerprint(spec),
+        'start': spec['start'],
+        'requirements': spec.get('requirements') or {},
+        'order': [names[id(station)] for station in sequence],
+        'stations': entries,
+    })
+
+
+def load_plan(spec_path: str, plan_path=None, recompile=False) -> CompiledPlan:
+    """
+    Return the compiled plan of a spec file, reusing the plan saved at plan_path if it was
+    compiled from the same spec, else compiling and saving it.
+
+    Note that plans do not track changes to tool code (eg .valid_options or requirements), so
+    recompile after such changes.
+    :param spec_path: str, spec path
+    :param plan_path: optional str, plan path, defaults to spec_path + '.plan.json'
+    :param recompile: bool, compile even if a matching plan is saved
+    :return: CompiledPlan
+    """
+    spec = load_spec(spec_path)
+    plan_path = plan_path or spec_path + '.plan.json'
+    if not recompile and os.path.exists(plan_path):
+        plan = CompiledPlan.load(plan_path)
+        if plan.fingerprint == spec_fingerprint(spec):
+            return plan
+    plan = compile_spec(spec)
+    plan.save(plan_path)
+    return plan
+
+
+def operate_compiled_plan(plan: CompiledPlan, lazy=True, **kwargs) -> list:
+    """
+    Instantiate a compiled plan and run stage 3 only.
+    :param plan: CompiledPlan
+    :param lazy: bool, hold resources as LazyTool handles until built
+    :param kwargs: build_workstation_graph() arguments (verbose, executor, max_workers, release,
+        keep)
+    :return: list, stage 2 sequence of workstations and sequence of built workstations
+    """
+    _, sequence = plan.instantiate(lazy=lazy)
+    with span('stage', 'stage_3', executor=kwargs.get('executor')):
+        built = build_workstation_graph(sequence, **kwargs)
+    return sequence + built
@@ -0,0 +1,96 @@
+from collections import deque
+from itertools import chain
+
+from factory.factory import WorkStation, find_cycle
+from factory.plan import station_names
+
+
+def validate_workstation_graph(start_node: WorkStation, raise_errors=True) -> list:
+    """
+    Structural validation of a workstation graph in one linear pass, before planning. Reports:
+
+    - circular dependencies, as the path of the cycle
+    - manager/supplier asymmetry, ie a supplier that does not list its manager back (or a
+      manager that does not list its supplier back)
+    - unreachable workstations, ie connected to the graph but not supplying the starting
+      workstation, so that they would never be engaged or built
+
+    Each problem names the path from the starting workstation to where it was found. Workstations
+    are named by class, suffixed with their position in discovery order where a class is used
+    more than once.
+
+    :param start_node: starting workstation
+    :param raise_errors: bool, raise ValueError listing all problems, if any
+    :return: list, of problems (str)
+    """
+    # breadth-first from start along supplier edges, recording the path to each workstation
+    parents = {id(start_node): None}
+    stations = [start_node]
+    queue = deque([start_node])
+    while queue:
+        current = queue.popleft()
+        for supplier in current.suppliers or []:
+            if id(supplier) not in parents:
+                parents[id(supplier)] = current
+                stations.append(supplier)
+                queue.append(supplier)
+    reachable = len(stations)
+
+    # then any other workstations connected to those through managers or suppliers
+    found_by = {}
+    i = 0
+    while i < len(stations):
+        current = stations[i]
+        for neighbour in chain(current.managers or [], current.suppliers or []):
+            if id(neighbour) not in parents and id(neighbour) not in found_by:
+                found_by[id(neighbour)] = current
+                stations.append(neighbour)
+        i += 1
+
+    names = station_names(stations)
+
+    def path_to(station):
+        path = []
+        while station is not None:
+            path.append(names[id(station)])
+            station = parents.get(id(station))
+        return ' -> '.join(reversed(path))
+
+    problems = []
+    cycle = find_cycle(start_node)
+    if cycle:
+        problems.append(
+            f"Circular dependency: {' -> '.join(names[id(node)] for node in cycle)} "
+            f"(reached by {path_to(cycle[0])})."
+        )
+
+    # index connections once per workstation, so each edge is checked in constant time
+    manager_ids = {id(s): {id(manager) for manager in s.managers or []} for s in stations}
+    supplier_ids = {id(s): {id(supplier) for supplier in s.suppliers or []} for s in stations}
+
+    for station in stations[:reachable]:
+        for supplier in station.suppliers or []:
+            if id(station) not in manager_ids[id(supplier)]:
+                problems.append(
+                    f'Asymmetric connection: {names[id(supplier)]} is a supplier of '
+                    f'{names[id(station)]} but does not list it as a manager '
+                    f'(at {path_to(supplier)}).'
+                )
+        for manager in station.managers or []:
+            if id(manager) in parents and id(station) not in supplier_ids[id(manager)]:
+                problems.append(
+                    f'Asymmetric connection: {names[id(manager)]} is a manager of '
+                    f'{names[id(station)]} but does not list it as a supplier '
+                    f'(at {path_to(station)}).'
+                )
+
+    for station in stations[reachable:]:
+        via = found_by[id(station)]
+        problems.append(
+            f'Unreachable workstation: {names[id(station)]} is connected to {names[id(via)]} '
+            f'(at {path_to(via)}) but does not supply {names[id(start_node)]}.'
+        )
+
+    if problems and raise_errors:
+        raise ValueError('Invalid workstation graph:\n' + '\n'.join(problems))
+    return problems
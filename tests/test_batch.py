@@ -0,0 +1,160 @@
+import sys
+import os
+import threading
+from collections import Counter
+import pytest
+
+sys.path.append(os.path.abspath('../factory'))
+from factory.factory import WorkStation, Tool, StreamWorkStation, StreamTool
+from factory.factory import operate_workstation_graph
+from factory.batch import BatchTool, iter_batches, reduce_batches, to_columns
+sys.path.append(os.path.abspath('../tests'))
+
+
+EVENTS = [{'link': i % 7, 'mode': 'car' if i % 3 else 'bus'} for i in range(1000)]
+EXPECTED = Counter(event['link'] for event in EVENTS if event['mode'] == 'car')
+
+
+class Config:
+    def __init__(self, requirements):
+        self.requirements = requirements
+
+    def get_requirements(self):
+        return self.requirements
+
+
+class Events(StreamTool):
+    streams = 0
+
+    def stream(self):
+        Events.streams += 1
+        yield from EVENTS
+
+
+class TupleEvents(StreamTool):
+    fields = ['link', 'mode']
+
+    def stream(self):
+        for event in EVENTS:
+            yield event['link'], event['mode']
+
+
+class ColumnEvents(Tool):
+
+    def build(self, resource):
+        self.columns = to_columns(EVENTS)
+
+
+class VolumeCounts(BatchTool):
+    req = ['events']
+    valid_options = ['car']
+    chunk_size = 64
+    reduced = 0
+    lock = threading.Lock()
+
+    def get_requirements(self):
+        return {'events': None}
+
+    def accumulator(self):
+        return Counter()
+
+    def reduce(self, accumulator, batch):
+        with VolumeCounts.lock:  # ie reduced by ParallelVolumeCounts threads
+            VolumeCounts.reduced += 1
+        for link, mode in zip(batch['link'], batch['mode']):
+            if mode == self.option:
+                accumulator[int(link)] += 1
+        return accumulator
+
+
+class ParallelVolumeCounts(VolumeCounts):
+    chunk_workers = 4
+
+
+class Start(WorkStation):
+    tools = None
+
+
+def graph(station_class, tools, events):
+    start, handler, inputs = Start(Config({'volume_counts': ['car']})), station_class(None), \
+        WorkStation(None)
+    handler.tools = tools
+    inputs.tools = {'events': events}
+    start.connect(None, [handler])
+    handler.connect([start], [inputs])
+    inputs.connect([handler], None)
+    return start, handler, inputs
+
+
+@pytest.mark.parametrize('station_class', [WorkStation, StreamWorkStation])
+@pytest.mark.parametrize('events', [Events, ColumnEvents])
+@pytest.mark.parametrize('tool', [VolumeCounts, ParallelVolumeCounts])
+def test_batch_tool_counts_in_chunks(station_class, events, tool):
+    Events.streams = 0
+    VolumeCounts.reduced = 0
+    start, handler, inputs = graph(station_class, {'volume_counts': tool}, events)
+    operate_workstation_graph(start)
+
+    assert handler.resources['volume_counts:car'].result == EXPECTED
+    assert VolumeCounts.reduced == 16  # ie ceil(1000 / 64)
+    assert Events.streams == (events is Events)
+
+
+@pytest.mark.parametrize('station_class', [WorkStation, StreamWorkStation])
+def test_batch_tool_counts_tuple_records(station_class):
+    start, handler, inputs = graph(station_class, {'volume_counts': VolumeCounts}, TupleEvents)
+    operate_workstation_graph(start)
+    assert handler.resources['volume_counts:car'].result == EXPECTED
+
+
+def test_batch_tool_rebuild_after_streaming():
+    start, handler, inputs = graph(StreamWorkStation, {'volume_counts': VolumeCounts}, Events)
+    operate_workstation_graph(start)
+    tool = handler.resources['volume_counts:car']
+    columns = ColumnEvents()
+    columns.build({})
+    tool.build({'events': columns})
+    assert tool.result == EXPECTED
+
+
+def test_iter_batches_slices_columns():
+    resource = ColumnEvents()
+    resource.build({})
+    batches = list(iter_batches(resource, 300))
+    assert [len(batch['link']) for batch in batches] == [300, 300, 300, 100]
+    assert list(batches[1]['link'][:2]) == [300 % 7, 301 % 7]
+
+
+def test_reduce_batches_merges_partials_in_order():
+    class Concat(BatchTool):
+        def accumulator(self):
+            return []
+
+        def reduce(self, accumulator, batch):
+            return accumulator + list(batch['x'])
+
+    batches = ({'x': [i, i + 1]} for i in range(0, 100, 2))
+    assert reduce_batches(Concat(), batches, workers=3) == list(range(100))
+
+
+def test_to_columns_requires_fields_for_tuples():
+    assert {k: list(v) for k, v in to_columns([(1, 'a'), (2, 'b')], ['n', 's']).items()} == \
+        {'n': [1, 2], 's': ['a', 'b']}
+    with pytest.raises(ValueError):
+        to_columns([(1, 'a')])
+
+
+def test_numpy_accumulator():
+    np = pytest.importorskip('numpy')
+
+    class Counts(VolumeCounts):
+        def accumulator(self):
+            return np.zeros(7, dtype=int)
+
+        def reduce(self, accumulator, batch):
+            np.add.at(accumulator, batch['link'][batch['mode'] == self.option], 1)
+            return accumulator
+
+    start, handler, inputs = graph(WorkStation, {'volume_counts': Counts}, ColumnEvents)
+    operate_workstation_graph(start)
+    assert list(handler.resources['volume_counts:car'].result) == [EXPECTED[i] for i in range(7)]
@@ -0,0 +1,178 @@
+import sys
+import os
+import pytest
+
+sys.path.append(os.path.abspath('../factory'))
+from factory.factory import WorkStation, Tool, operate_workstation_graph
+from factory.factory import StreamWorkStation, StreamTool
+from factory.cache import ResourceCache
+sys.path.append(os.path.abspath('../tests'))
+
+
+builds = []
+
+
+class Config:
+    def __init__(self, requirements):
+        self.requirements = requirements
+
+    def get_requirements(self):
+        return self.requirements
+
+
+class CountedTool(Tool):
+    valid_options = [None, 'car', 'bus']
+
+    def build(self, resource):
+        super().build(resource)
+        builds.append((type(self).__name__, self.option))
+        self.value = [self.option] * 100
+
+
+class VKT(CountedTool):
+    req = ['volume_counts']
+
+
+class VolumeCounts(CountedTool):
+    req = ['events']
+
+    def get_requirements(self):
+        return {'events': None}
+
+
+class Events(CountedTool):
+    token = 1
+
+    def cache_token(self):
+        return self.token
+
+
+class Station(WorkStation):
+    tools = None
+
+
+class PostProcess(WorkStation):
+    tools = {'vkt': VKT}
+
+
+class HandlerProcess(WorkStation):
+    tools = {'volume_counts': VolumeCounts}
+
+
+class InputProcess(WorkStation):
+    tools = {'events': Events}
+
+
+def run(requirements, cache, lazy=False):
+    config = Config(requirements)
+    start, post, handler, inputs = (
+        Station(config), PostProcess(config), HandlerProcess(config), InputProcess(config)
+    )
+    start.connect(None, [post, handler])
+    post.connect([start], [handler])
+    handler.connect([start, post], [inputs])
+    inputs.connect([handler], None)
+    builds.clear()
+    operate_workstation_graph(start, cache=cache, lazy=lazy)
+    return post, handler
+
+
+def test_rerun_restores_all_resources(tmp_path):
+    cache = ResourceCache(str(tmp_path))
+    run({'vkt': ['bus']}, cache)
+    assert len(builds) == 3
+
+    post, _ = run({'vkt': ['bus']}, ResourceCache(str(tmp_path)))
+    assert builds == []
+    assert post.resources['vkt:bus'].value == ['bus'] * 100
+
+
+def test_config_change_rebuilds_affected_resources(tmp_path):
+    cache = ResourceCache(str(tmp_path))
+    run({'vkt': ['bus']}, cache)
+    run({'vkt': ['bus', 'car']}, cache)
+    assert sorted(builds) == [('VKT', 'car'), ('VolumeCounts', 'car')]
+    assert cache.hits == 3
+
+
+def test_upstream_change_rebuilds_downstream(tmp_path):
+    cache = ResourceCache(str(tmp_path))
+    run({'vkt': ['bus']}, cache)
+    Events.token = 2
+    try:
+        run({'vkt': ['bus']}, cache)
+    finally:
+        Events.token = 1
+    assert sorted(builds) == [('Events', None), ('VKT', 'bus'), ('VolumeCounts', 'bus')]
+
+
+def test_lru_eviction(tmp_path):
+    cache = ResourceCache(str(tmp_path), max_bytes=250)
+    cache.store('a', 'a' * 100)
+    cache.store('b', 'b' * 100)
+    assert cache.load('a') == 'a' * 100
+    cache.store('c', 'c' * 100)
+    assert cache.load('b') is None
+    assert cache.load('a') == 'a' * 100
+    assert cache.load('c') == 'c' * 100
+    assert cache.size <= 250
+
+
+def test_lazy_cache_hits_are_not_initiated(tmp_path):
+    cache = ResourceCache(str(tmp_path))
+    run({'vkt': ['bus']}, cache, lazy=True)
+    assert len(builds) == 3
+
+    post, _ = run({'vkt': ['bus']}, cache, lazy=True)
+    assert builds == []
+    assert isinstance(post.resources['vkt:bus'], VKT)
+
+
+class StreamEvents(StreamTool):
+    streams = 0
+
+    def cache_token(self):
+        return 1
+
+    def stream(self):
+        StreamEvents.streams += 1
+        yield from range(100)
+
+
+class StreamCounts(Tool):
+    valid_options = ['car', 'bus']
+
+    def get_requirements(self):
+        return {'events': None}
+
+    def consume(self, requirement, record):
+        self.value = getattr(self, 'value', 0) + 1
+
+    def build(self, resource):
+        super().build(resource)
+        builds.append((type(self).__name__, self.option))
+
+
+def test_cached_stream_consumers_do_not_read_stream(tmp_path):
+    def run_stream(cache):
+        start = Station(Config({'counts': ['car', 'bus']}))
+        handler, inputs = StreamWorkStation(None), InputProcess(None)
+        handler.tools = {'counts': StreamCounts}
+        inputs.tools = {'events': StreamEvents}
+        start.connect(None, [handler])
+        handler.connect([start], [inputs])
+        inputs.connect([handler], None)
+        builds.clear()
+        StreamEvents.streams = 0
+        operate_workstation_graph(start, cache=cache)
+        return handler
+
+    run_stream(ResourceCache(str(tmp_path)))
+    assert StreamEvents.streams == 1
+
+    cache = ResourceCache(str(tmp_path))
+    handler = run_stream(cache)
+    assert (cache.hits, cache.misses) == (3, 0)
+    assert StreamEvents.streams == 0
+    assert builds == []
+    assert handler.resources['counts:bus'].value == 100
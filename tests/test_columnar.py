@@ -0,0 +1,104 @@
+import sys
+import os
+import pickle
+import pytest
+
+sys.path.append(os.path.abspath('../factory'))
+from factory.factory import WorkStation, operate_workstation_graph
+from factory.batch import BatchTool
+from factory.columnar import ColumnarFile, ColumnarTool, StringColumn, write_columns
+sys.path.append(os.path.abspath('../tests'))
+
+
+COLUMNS = {
+    'link': list(range(1000)),
+    'time': [i / 4 for i in range(1000)],
+    'car': [i % 3 > 0 for i in range(1000)],
+    'agent': [f'agent_{i % 17}' for i in range(1000)],
+}
+
+
+class Config:
+    def __init__(self, requirements):
+        self.requirements = requirements
+
+    def get_requirements(self):
+        return self.requirements
+
+
+class Events(ColumnarTool):
+
+    def build(self, resource):
+        self.save_columns(COLUMNS)
+
+
+class CarCount(BatchTool):
+    req = ['events']
+    chunk_size = 100
+
+    def accumulator(self):
+        return 0
+
+    def reduce(self, accumulator, batch):
+        return accumulator + sum(batch['car'])
+
+    def finalize(self, accumulator, resource):
+        self.result = accumulator
+        self.pid = os.getpid()
+
+
+class Start(WorkStation):
+    tools = None
+
+
+class Handler(WorkStation):
+    tools = {'car_count': CarCount}
+
+
+class Inputs(WorkStation):
+    tools = {'events': Events}
+
+
+def test_columnar_file_round_trip(tmp_path):
+    path = str(tmp_path / 'events.fcol')
+    header = write_columns(path, COLUMNS)
+    assert [c['dtype'] for c in header['columns']] == ['i8', 'f8', 'b1', 'str']
+
+    columns = ColumnarFile(path)
+    assert columns.length == 1000
+    assert list(columns) == ['link', 'time', 'car', 'agent']
+    for name, values in COLUMNS.items():
+        assert list(columns[name]) == values
+    assert isinstance(columns['agent'], StringColumn)
+    assert list(columns['agent'][17:20]) == ['agent_0', 'agent_1', 'agent_2']
+    assert columns['agent'][-1] == 'agent_13'
+
+
+def test_columnar_file_pickles_as_path(tmp_path):
+    path = str(tmp_path / 'events.fcol')
+    write_columns(path, COLUMNS)
+    data = pickle.dumps(ColumnarFile(path))
+    assert len(data) < 200
+    assert list(pickle.loads(data)['time'][:3]) == [0.0, 0.25, 0.5]
+
+
+def test_write_columns_rejects_unequal_lengths(tmp_path):
+    with pytest.raises(ValueError, match='unequal lengths'):
+        write_columns(str(tmp_path / 'x.fcol'), {'a': [1, 2], 'b': [1]})
+
+
+@pytest.mark.parametrize('executor', [None, 'process'])
+def test_columnar_resources_are_mapped_downstream(tmp_path, monkeypatch, executor):
+    monkeypatch.setattr(Events, 'columnar_dir', str(tmp_path))
+    start, handler, inputs = Start(Config({'car_count': None})), Handler(None), Inputs(None)
+    start.connect(None, [handler])
+    handler.connect([start], [inputs])
+    inputs.connect([handler], None)
+    operate_workstation_graph(start, executor=executor)
+
+    assert handler.resources['car_count'].result == sum(COLUMNS['car'])
+    assert (handler.resources['car_count'].pid != os.getpid()) == (executor == 'process')
+    events = inputs.resources['events']
+    assert os.path.dirname(events.columns.path) == str(tmp_path)
+    events.discard()
+    assert not os.listdir(tmp_path)
@@ -0,0 +1,103 @@
+import sys
+import os
+import threading
+import pytest
+
+sys.path.append(os.path.abspath('../factory'))
+from factory.factory import WorkStation, Tool, operate_workstation_graph
+from factory.distributed import DirectoryBackend, StoredResources, worker_loop
+from factory.distributed import _store_resources
+sys.path.append(os.path.abspath('../tests'))
+
+
+class Config:
+    def __init__(self, requirements):
+        self.requirements = requirements
+
+    def get_requirements(self):
+        return self.requirements
+
+
+class Source(Tool):
+    valid_options = [1, 2, 3]
+
+    def build(self, resource):
+        super().build(resource)
+        self.value = self.option
+        self.pid = os.getpid()
+
+
+class Double(Tool):
+    req = ['source']
+    valid_options = [1, 2, 3]
+
+    def get_requirements(self):
+        return {'source': [self.option]}
+
+    def build(self, resource):
+        super().build(resource)
+        self.value = 2 * resource[f'source:{self.option}'].value
+        self.pid = os.getpid()
+
+
+class Broken(Tool):
+
+    def build(self, resource):
+        raise KeyError('broken')
+
+
+class Start(WorkStation):
+    tools = None
+
+
+class Middle(WorkStation):
+    tools = {'double': Double, 'broken': Broken}
+
+
+class Inputs(WorkStation):
+    tools = {'source': Source}
+
+
+def graph(requirements):
+    start, middle, inputs = Start(Config(requirements)), Middle(None), Inputs(None)
+    start.connect(None, [middle])
+    middle.connect([start], [inputs])
+    inputs.connect([middle], None)
+    return start, middle, inputs
+
+
+def test_directory_backend_builds_in_workers(tmp_path):
+    start, middle, inputs = graph({'double': [1, 2, 3]})
+    operate_workstation_graph(start, executor=DirectoryBackend(str(tmp_path), workers=2))
+
+    assert [middle.resources[f'double:{i}'].value for i in (1, 2, 3)] == [2, 4, 6]
+    assert [inputs.resources[f'source:{i}'].value for i in (1, 2, 3)] == [1, 2, 3]
+    assert middle.resources['double:1'].pid != os.getpid()
+    assert not os.listdir(tmp_path / 'resources')  # ie cleaned up
+
+
+def test_directory_backend_raises_worker_errors(tmp_path):
+    start, middle, inputs = graph({'broken': None})
+    with pytest.raises(KeyError, match='broken'):
+        operate_workstation_graph(start, executor=DirectoryBackend(str(tmp_path), workers=1))
+
+
+def test_directory_backend_with_external_worker(tmp_path):
+    worker = threading.Thread(target=worker_loop, args=(str(tmp_path),), kwargs={'idle_timeout': 1})
+    worker.start()
+    start, middle, inputs = graph({'double': [2]})
+    operate_workstation_graph(start, executor=DirectoryBackend(str(tmp_path), workers=0))
+    worker.join()
+
+    assert middle.resources['double:2'].value == 4
+    assert middle.resources['double:2'].pid == os.getpid()  # ie built by the worker thread
+
+
+def test_stored_resources_load_on_access(tmp_path):
+    _store_resources(str(tmp_path), {'a': 1, 'b:x': 2})
+    resources = StoredResources(str(tmp_path), ['a', 'b:x'])
+    assert list(resources) == ['a', 'b:x']
+    assert resources['b:x'] == 2
+    assert list(resources._loaded) == ['b:x']
+    with pytest.raises(KeyError):
+        resources['c']
@@ -1,10 +1,14 @@
 import sys
 import os
+import gc
+import weakref
 import pytest
 
 sys.path.append(os.path.abspath('../factory'))
 from elara_example import *
 from factory.factory import equals, operate_workstation_graph, build_graph_depth
+from factory.factory import replan_workstation_graph, engage_workstation_graph
+from factory.registry import ResourceRegistry
 sys.path.append(os.path.abspath('../tests'))
 
 
@@ -117,5 +121,66 @@ def test_engage_supply_chain(start, post_process, handler_process, inputs_proces
     assert set(config_paths.resources) == {'events_path', 'network_path'}
 
 
+def test_replan_after_config_change(start, post_process, handler_process, inputs_process, config_paths):
+    start.connect(None, [handler_process, post_process])
+    post_process.connect([start], [handler_process])
+    handler_process.connect([start, post_process], [inputs_process])
+    inputs_process.connect([handler_process], [config_paths])
+    config_paths.connect([inputs_process], None)
+
+    operate_workstation_graph(start)
+    vkt_bus = post_process.resources['vkt:bus']
+    events = inputs_process.resources['events']
+
+    class ExtendedConfig(Config):
+        def get_requirements(self):
+            return {'volume_counts': ['car'], 'vkt': ['bus', 'car']}
+
+    start.config = ExtendedConfig()
+    delta = replan_workstation_graph(start)
+
+    assert delta[post_process]['created'] == ['vkt:car']
+    assert delta[post_process]['reused'] == ['vkt:bus']
+    assert delta[handler_process]['created'] == []
+    assert delta[inputs_process]['created'] == []
+    assert post_process.resources['vkt:bus'] is vkt_bus
+    assert inputs_process.resources['events'] is events
+    assert equals(post_process.get_requirements(), {'volume_counts': ['bus', 'car']})
+
+
+@pytest.mark.parametrize("executor", [None, 'resource'])
+def test_release_consumed_resources(
+        start, post_process, handler_process, inputs_process, config_paths, executor
+):
+    start.connect(None, [handler_process, post_process])
+    post_process.connect([start], [handler_process])
+    handler_process.connect([start, post_process], [inputs_process])
+    inputs_process.connect([handler_process], [config_paths])
+    config_paths.connect([inputs_process], None)
+
+    build_graph_depth(start)
+    engage_workstation_graph(start)
+    events = weakref.ref(inputs_process.resources['events'])
+    operate_workstation_graph(start, executor=executor, release=True, keep=['network'])
+
+    assert set(post_process.resources) == {'vkt:bus'}
+    assert set(handler_process.resources) == {'volume_counts:car'}
+    assert set(inputs_process.resources) == {'network'}
+    assert set(config_paths.resources) == set()
+    gc.collect()
+    assert events() is None
+
+
+def test_registry_shares_path_tools(start, post_process, handler_process, inputs_process, config_paths):
+    start.connect(None, [handler_process, post_process])
+    post_process.connect([start], [handler_process])
+    handler_process.connect([start, post_process], [inputs_process])
+    inputs_process.connect([handler_process], [config_paths])
+    config_paths.connect([inputs_process], None)
 
+    registry = ResourceRegistry()
+    operate_workstation_graph(start, registry=registry)
 
+    paths = config_paths.resources
+    assert paths['network_path'] is paths['events_path']
+    assert (registry.hits, registry.misses) == (1, 6)
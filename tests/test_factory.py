@@ -0,0 +1,516 @@
+import asyncio
+import sys
+import os
+import subprocess
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import pytest
+
+sys.path.append(os.path.abspath('../factory'))
+from factory.factory import WorkStation, Tool, build_graph_depth, operate_workstation_graph
+from factory.factory import build_workstation_graph, StreamWorkStation, StreamTool
+from factory.factory import engage_workstation_graph, equals
+from factory.factory import requirements_cache_info, LazyTool, ResourceView
+from factory.factory import operate_workstation_graph_async, resolve_tool
+sys.path.append(os.path.abspath('../tests'))
+
+
+class Station(WorkStation):
+    tools = None
+
+
+def diamond_lattice(layers):
+    """
+    Repeated b/c -> d diamonds, ie 2 ** layers paths from start to end.
+    """
+    start = Station(None)
+    top = start
+    stations = [start]
+    for _ in range(layers):
+        b, c, d = Station(None), Station(None), Station(None)
+        top.connect(top.managers, [b, c])
+        b.connect([top], [d])
+        c.connect([top], [d])
+        d.connect([b, c], None)
+        stations.extend([b, c, d])
+        top = d
+    return stations
+
+
+def chain(length):
+    stations = [Station(None) for _ in range(length)]
+    for i, station in enumerate(stations):
+        managers = [stations[i - 1]] if i else None
+        suppliers = [stations[i + 1]] if i + 1 < length else None
+        station.connect(managers, suppliers)
+    return stations
+
+
+def test_diamond_lattice_depths():
+    stations = diamond_lattice(100)
+    order = build_graph_depth(stations[0])
+    assert len(order) == len(stations)
+    for layer in range(100):
+        b, c, d = stations[1 + 3 * layer: 4 + 3 * layer]
+        assert b.depth == c.depth == 2 * layer + 1
+        assert d.depth == 2 * layer + 2
+
+
+def test_deep_chain_reports_recursion_limit():
+    stations = chain(sys.getrecursionlimit() + 10)
+    with pytest.raises(ValueError, match='recursion limit'):
+        build_graph_depth(stations[0])
+
+
+def test_cycle_reports_circular_dependency():
+    a, b, c = chain(3)
+    c.connect([b], [a])
+    with pytest.raises(ValueError, match='Circular dependency'):
+        build_graph_depth(a)
+
+
+def test_thread_executor_builds_siblings_concurrently():
+    barrier = threading.Barrier(2, timeout=5)
+
+    class Config:
+        def get_requirements(self):
+            return {'left': None, 'right': None}
+
+    class Sibling(Tool):
+        def build(self, resource):
+            barrier.wait()  # both siblings must be building at the same time
+
+    start, left, right = Station(Config()), Station(Config()), Station(Config())
+    left.tools = {'left': Sibling}
+    right.tools = {'right': Sibling}
+    start.connect(None, [left, right])
+    left.connect([start], None)
+    right.connect([start], None)
+
+    sequence = operate_workstation_graph(start, executor='thread', max_workers=2)
+    assert sequence[-1] == start
+
+
+def test_unsupported_executor():
+    with pytest.raises(ValueError, match='Unsupported executor'):
+        build_workstation_graph(chain(2), executor='gpu')
+
+
+class Counts(Tool):
+    valid_options = ['car', 'bus', 'rail', 'walk']
+    process_safe = True
+
+    def build(self, resource):
+        self.built = os.getpid()
+
+
+class SerialCounts(Counts):
+    process_safe = False
+
+
+def test_process_executor_builds_tools_in_order():
+    station = Station(None)
+    station.resources = {
+        'counts:car': Counts('car'),
+        'counts:bus': SerialCounts('bus'),
+        'counts:rail': Counts('rail'),
+        'counts:walk': Counts('walk'),
+    }
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        station.executor = executor
+        station.build()
+
+    assert list(station.resources) == ['counts:car', 'counts:bus', 'counts:rail', 'counts:walk']
+    assert [tool.option for tool in station.resources.values()] == ['car', 'bus', 'rail', 'walk']
+    assert station.resources['counts:bus'].built == os.getpid()
+    assert station.resources['counts:car'].built != os.getpid()
+
+
+def test_thread_executor_builds_thread_safe_tools_concurrently():
+    barrier = threading.Barrier(2, timeout=5)
+
+    class Concurrent(Tool):
+        valid_options = ['car', 'bus']
+        thread_safe = True
+
+        def build(self, resource):
+            barrier.wait()
+
+    station = Station(None)
+    station.resources = {'counts:car': Concurrent('car'), 'counts:bus': Concurrent('bus')}
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        station.executor = executor
+        station.build()
+
+
+def test_stream_workstation_reads_stream_once():
+    passes = []
+
+    class Config:
+        def get_requirements(self):
+            return {'volume_counts': ['car', 'bus'], 'mode_share': None}
+
+    class Events(StreamTool):
+        def stream(self):
+            passes.append(self)
+            yield from ['car', 'bus', 'car', 'walk']
+
+    class VolumeCounts(Tool):
+        req = ['events']
+        valid_options = ['car', 'bus']
+
+        def get_requirements(self):
+            return {'events': None}
+
+        def consume(self, requirement, record):
+            self.count = getattr(self, 'count', 0) + (record == self.option)
+
+    class ModeShare(Tool):
+        req = ['events']
+
+        def consume(self, requirement, record):
+            self.records = getattr(self, 'records', 0) + 1
+
+    class Handler(StreamWorkStation):
+        tools = {'volume_counts': VolumeCounts, 'mode_share': ModeShare}
+
+    start, handler, inputs = Station(Config()), Handler(Config()), Station(Config())
+    inputs.tools = {'events': Events}
+    start.connect(None, [handler])
+    handler.connect([start], [inputs])
+    inputs.connect([handler], None)
+
+    operate_workstation_graph(start)
+    assert len(passes) == 1
+    assert handler.resources['volume_counts:car'].count == 2
+    assert handler.resources['volume_counts:bus'].count == 1
+    assert handler.resources['mode_share'].records == 4
+
+
+def test_empty_requirements_are_cached():
+
+    class Config:
+        def get_requirements(self):
+            return {}
+
+    stations = diamond_lattice(30)
+    for station in stations:
+        station.config = Config()
+    end = stations[-1]
+
+    assert end.get_requirements() == {}
+    assert requirements_cache_info(stations[0]) == {'hits': 30, 'misses': len(stations)}
+    assert end.get_requirements() == {}
+    assert end.requirements_hits == 1
+
+    stations[-4].invalidate_requirements()
+    assert not end.requirements_cached
+    assert stations[-5].requirements_cached
+
+
+class Initiated(Tool):
+    valid_options = [None, 'car', 'bus']
+    initiated = []
+
+    def __init__(self, option=None):
+        super().__init__(option)
+        Initiated.initiated.append(self)
+
+    def build(self, resource):
+        super().build(resource)
+        self.built = len(Initiated.initiated)
+
+
+def lazy_graph():
+
+    class Config:
+        def get_requirements(self):
+            return {'vkt': ['car', 'bus']}
+
+    class VKT(Initiated):
+        req = ['counts']
+
+    start, post, handler = Station(Config()), Station(Config()), Station(Config())
+    post.tools = {'vkt': VKT}
+    handler.tools = {'counts': Initiated}
+    start.connect(None, [post])
+    post.connect([start], [handler])
+    handler.connect([post], None)
+    return start, post, handler
+
+
+def test_lazy_tools_are_initiated_when_built():
+    Initiated.initiated.clear()
+    start, post, handler = lazy_graph()
+    start.lazy = post.lazy = handler.lazy = True
+    engage_workstation_graph(start)
+    assert Initiated.initiated == []
+    assert isinstance(post.resources['vkt:car'], LazyTool)
+    assert equals(post.get_requirements(), {'counts': ['car', 'bus']})
+
+    handler.build()
+    assert len(Initiated.initiated) == 2
+    post.build()
+    assert [tool.built for tool in post.resources.values()] == [3, 4]
+    assert not any(isinstance(tool, LazyTool) for tool in handler.resources.values())
+
+
+def test_lazy_operate_workstation_graph():
+    Initiated.initiated.clear()
+    start, post, handler = lazy_graph()
+    sequence = operate_workstation_graph(start, lazy=True)
+    assert sequence == [start, post, handler, handler, post, start]
+    assert len(Initiated.initiated) == 4
+
+
+def test_run_settings_do_not_leak_into_later_runs():
+    class Registry:
+        def share(self, tool, resources, build):
+            return build()
+
+    start, post, handler = lazy_graph()
+    handler.lazy = True
+    operate_workstation_graph(start, lazy=True, registry=Registry())
+    assert [station.lazy for station in (start, post, handler)] == [False, False, True]
+    assert start.registry is post.registry is handler.registry is None
+
+    operate_workstation_graph(start)
+    assert not any(isinstance(tool, LazyTool) for tool in post.resources.values())
+
+
+def test_resource_view_chains_supplier_resources():
+    first = {'a:1': 'A1', 'b': 'B'}
+    second = {'a:1': 'A1-second', 'c': 'C'}
+    view = ResourceView([first, second])
+
+    assert view['a:1'] == 'A1-second'
+    assert 'b' in view and 'd' not in view
+    assert list(view) == ['a:1', 'b', 'c']
+    assert len(view) == 3
+    assert dict(view) == {'a:1': 'A1-second', 'b': 'B', 'c': 'C'}
+    with pytest.raises(TypeError):
+        view['d'] = 'D'
+
+    second['d'] = 'D'  # views are live
+    assert view['d'] == 'D'
+
+
+def test_gather_resources_is_a_view():
+    a, b, c = Station(None), Station(None), Station(None)
+    b.resources = {'x': 1}
+    c.resources = {'x': 2, 'y': 3}
+    a.connect(None, [b, c])
+    resources = a.gather_resources()
+    assert isinstance(resources, ResourceView)
+    assert resources['x'] == 2
+
+
+def test_release_waits_for_managers_iterating_supplier_views():
+    b_built = threading.Event()
+
+    class Config:
+        def get_requirements(self):
+            return {'scan': None, 'pick': None}
+
+    class Source(Tool):
+        valid_options = ['a', 'b']
+
+    class Scan(Tool):
+        def get_requirements(self):
+            return {'source': ['a']}
+
+        def build(self, resource):
+            self.keys = []
+            for key in resource:  # ie a live view of the supplier resources
+                b_built.wait(timeout=5)
+                time.sleep(0.05)  # ie while the resources of pick are released
+                self.keys.append(key)
+
+    class Pick(Tool):
+        def get_requirements(self):
+            return {'source': ['b']}
+
+        def build(self, resource):
+            b_built.set()
+
+    start, scan, pick, source = Station(Config()), Station(None), Station(None), Station(None)
+    scan.tools, pick.tools, source.tools = {'scan': Scan}, {'pick': Pick}, {'source': Source}
+    start.connect(None, [scan, pick])
+    scan.connect([start], [source])
+    pick.connect([start], [source])
+    source.connect([scan, pick], None)
+    operate_workstation_graph(start, executor='thread', release=True)
+
+    assert scan.resources['scan'].keys == ['source:a', 'source:b']
+    assert source.resources == {}
+
+
+class Fetch(Tool):
+    valid_options = [1, 2, 3, 4]
+    active = []
+    most = []
+
+    async def build(self, resource):
+        super().build(resource)
+        Fetch.active.append(self)
+        Fetch.most.append(len(Fetch.active))
+        await asyncio.sleep(0.05)
+        Fetch.active.remove(self)
+        self.value = self.option
+
+
+class Total(Tool):
+    valid_options = [None]
+
+    def get_requirements(self):
+        return {'fetch': [1, 2, 3, 4]}
+
+    def build(self, resource):
+        super().build(resource)
+        self.value = sum(resource[f'fetch:{i}'].value for i in range(1, 5))
+        self.thread = threading.get_ident()
+
+
+def async_graph(requirements):
+    class Config:
+        def get_requirements(self):
+            return requirements
+
+    start, total, fetch = Station(Config()), Station(None), Station(None)
+    total.tools = {'total': Total}
+    fetch.tools = {'fetch': Fetch}
+    start.connect(None, [total, fetch])
+    total.connect([start], [fetch])
+    fetch.connect([start, total], None)
+    return start, total, fetch
+
+
+@pytest.mark.parametrize('max_concurrency,expected', [(None, 4), (2, 2)])
+def test_async_tools_are_awaited_concurrently(max_concurrency, expected):
+    Fetch.most.clear()
+    start, total, fetch = async_graph({'fetch': [1, 2, 3, 4]})
+    asyncio.run(operate_workstation_graph_async(start, max_concurrency=max_concurrency))
+    assert max(Fetch.most) == expected
+    assert [tool.value for tool in fetch.resources.values()] == [1, 2, 3, 4]
+
+
+def test_async_build_adapts_sync_tools():
+    start, total, fetch = async_graph({'total': None})
+    sequence = asyncio.run(operate_workstation_graph_async(start))
+    assert sequence[-1] == start
+    assert total.resources['total'].value == 10
+    assert total.resources['total'].thread != threading.get_ident()
+
+
+def test_async_build_initiates_lazy_tools_in_pool():
+
+    class Config:
+        def get_requirements(self):
+            return {'slow': [1, 2, 3, 4]}
+
+    class SlowInit(Tool):
+        valid_options = [1, 2, 3, 4]
+        thread_safe = True
+        threads = []
+
+        def __init__(self, option=None):
+            super().__init__(option)
+            SlowInit.threads.append(threading.get_ident())
+            time.sleep(0.2)
+
+    start, slow = Station(Config()), Station(None)
+    slow.tools = {'slow': SlowInit}
+    start.connect(None, [slow])
+    slow.connect([start], None)
+    began = time.perf_counter()
+    asyncio.run(operate_workstation_graph_async(start, max_workers=4, lazy=True))
+    assert time.perf_counter() - began < 0.6  # ie not initiated one at a time
+    assert len(SlowInit.threads) == 4 and threading.get_ident() not in SlowInit.threads
+
+
+def test_sync_build_rejects_async_tools():
+    start, total, fetch = async_graph({'fetch': [1]})
+    with pytest.raises(TypeError, match='Tool: Fetch has an async build()'):
+        operate_workstation_graph(start)
+
+
+def test_resource_executor_starts_resources_before_slow_siblings():
+    fast_built = threading.Event()
+
+    class Config:
+        def get_requirements(self):
+            return {'slow': None, 'cheap': None}
+
+    class Slow(Tool):
+        thread_safe = True
+
+        def build(self, resource):
+            self.waited = fast_built.wait(timeout=5)  # ie only set if cheap is built meanwhile
+
+    class Fast(Tool):
+        thread_safe = True
+
+    class Cheap(Tool):
+        req = ['fast']
+
+        def build(self, resource):
+            super().build(resource)
+            fast_built.set()
+
+    start, post, handler = Station(Config()), Station(Config()), Station(Config())
+    post.tools = {'cheap': Cheap}
+    handler.tools = {'slow': Slow, 'fast': Fast}
+    start.connect(None, [post, handler])
+    post.connect([start], [handler])
+    handler.connect([start, post], None)
+
+    sequence = operate_workstation_graph(start, executor='resource', max_workers=2)
+    assert handler.resources['slow'].waited
+    assert sequence[-1] == start
+
+
+TOOL_MODULE = """
+from factory.factory import Tool
+
+
+class {name}(Tool):
+    valid_options = [None, 'car']
+"""
+
+
+def test_tools_registered_by_import_path_are_imported_when_required(tmp_path, monkeypatch):
+    for name in ('lazy_needed', 'lazy_unused'):
+        (tmp_path / f'{name}.py').write_text(TOOL_MODULE.format(name='Counts'))
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    class Config:
+        def get_requirements(self):
+            return {'needed': ['car']}
+
+    start, supplier = Station(Config()), Station(None)
+    supplier.tools = {'needed': 'lazy_needed:Counts', 'unused': 'lazy_unused.Counts'}
+    start.connect(None, [supplier])
+    supplier.connect([start], None)
+    operate_workstation_graph(start)
+
+    assert type(supplier.resources['needed:car']).__module__ == 'lazy_needed'
+    assert 'lazy_unused' not in sys.modules
+
+
+def test_resolve_tool_entry_points():
+    class EntryPoint:
+        def load(self):
+            return Counts
+
+    assert resolve_tool(EntryPoint()) is Counts
+    assert resolve_tool(Counts) is Counts
+    assert resolve_tool('tests.test_factory:Counts') is Counts
+
+
+def test_import_does_not_import_slow_modules():
+    slow = ['asyncio', 'concurrent.futures', 'importlib.metadata', 'inspect', 'json']
+    code = f'import sys, factory.factory; print([m for m in {slow} if m in sys.modules])'
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True)
+    assert result.stdout.strip() == '[]'
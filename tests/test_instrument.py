@@ -0,0 +1,84 @@
+import asyncio
+import sys
+import os
+import json
+import pytest
+
+sys.path.append(os.path.abspath('../factory'))
+from simple_example import *
+from factory.factory import operate_workstation_graph, operate_workstation_graph_async
+from factory.instrument import Profiler, span
+sys.path.append(os.path.abspath('../tests'))
+
+
+config = Config()
+
+
+@pytest.fixture
+def start():
+    s, b, c, d, end = (
+        StartProcess(config), BProcess(config), CProcess(config), DProcess(config),
+        EndProcess(config)
+    )
+    s.connect(None, [b, c])
+    b.connect([s], [d])
+    c.connect([s], [d])
+    d.connect([b, c], [end])
+    end.connect([d], None)
+    return s
+
+
+def test_no_listeners_records_nothing():
+    profiler = Profiler()
+    with span('stage', 'unused'):
+        pass
+    assert profiler.records == []
+
+
+def test_profile_stages_workstations_and_tools(start):
+    with Profiler(memory=True) as profiler:
+        operate_workstation_graph(start)
+
+    stages = [r['name'] for r in profiler.records if r['category'] == 'stage']
+    assert stages == ['stage_1', 'stage_2', 'stage_3']
+    workstations = [r['name'] for r in profiler.records if r['category'] == 'workstation']
+    assert workstations == ['EndProcess', 'DProcess', 'CProcess', 'BProcess', 'StartProcess']
+    tools = {r['name'] for r in profiler.records if r['category'] == 'tool'}
+    assert tools == {'a:1', 'a:2', 'b:1', 'c:1', 'c:2', 'e:1', 'b:2'}
+    for record in profiler.records:
+        assert record['wall'] >= 0
+        assert record['cpu'] >= 0
+        assert record['peak_memory'] >= 0
+
+    walls = [r['wall'] for r in profiler.summary('stage')]
+    assert walls == sorted(walls, reverse=True)
+
+
+def test_profile_async_stages_workstations_and_tools(start):
+    with Profiler() as profiler:
+        asyncio.run(operate_workstation_graph_async(start))
+
+    stages = [r['name'] for r in profiler.records if r['category'] == 'stage']
+    assert stages == ['stage_1', 'stage_2', 'stage_3']
+    workstations = [r['name'] for r in profiler.records if r['category'] == 'workstation']
+    assert workstations[:2] == ['EndProcess', 'DProcess']
+    assert set(workstations[2:4]) == {'BProcess', 'CProcess'}  # ie built concurrently
+    assert workstations[4] == 'StartProcess'
+    tools = {r['name'] for r in profiler.records if r['category'] == 'tool'}
+    assert tools == {'a:1', 'a:2', 'b:1', 'c:1', 'c:2', 'e:1', 'b:2'}
+
+
+def test_export(start, tmp_path):
+    with Profiler() as profiler:
+        operate_workstation_graph(start)
+
+    records = json.loads(profiler.to_json(str(tmp_path / 'records.json')))
+    assert len(records) == len(profiler.records)
+
+    profiler.to_chrome_trace(str(tmp_path / 'trace.json'))
+    with open(tmp_path / 'trace.json') as f:
+        trace = json.load(f)
+    events = trace['traceEvents']
+    assert len(events) == len(profiler.records)
+    assert all(event['ph'] == 'X' and event['dur'] >= 0 for event in events)
+    assert min(event['ts'] for event in events) == 0
@@ -0,0 +1,139 @@
+import sys
+import os
+import pytest
+
+sys.path.append(os.path.abspath('../factory'))
+from elara_example import *
+from factory.factory import operate_workstation_graph
+from factory.instrument import Profiler
+from factory.factory import equals, engage_workstation_graph
+from factory.plan import plan_workstation_graph, dry_run_workstation_graph
+sys.path.append(os.path.abspath('../tests'))
+
+
+config = Config()
+
+
+@pytest.fixture
+def start():
+    s, post, handler, inputs, paths = (
+        StartProcess(config), PostProcess(config), HandlerProcess(config), InputProcess(config),
+        PathProcess(config)
+    )
+    s.connect(None, [handler, post])
+    post.connect([s], [handler])
+    handler.connect([s, post], [inputs])
+    inputs.connect([handler], [paths])
+    paths.connect([inputs], None)
+    return s
+
+
+def test_resource_dag(start):
+    plan = plan_workstation_graph(start)
+    assert set(plan.nodes) == {
+        'PostProcess/vkt:bus',
+        'HandlerProcess/volume_counts:car',
+        'HandlerProcess/volume_counts:bus',
+        'InputProcess/events',
+        'InputProcess/network',
+        'PathProcess/events_path',
+        'PathProcess/network_path',
+    }
+    assert plan.suppliers['PostProcess/vkt:bus'] == ['HandlerProcess/volume_counts:bus']
+    assert set(plan.suppliers['HandlerProcess/volume_counts:car']) == {
+        'InputProcess/events', 'InputProcess/network'
+    }
+    assert plan.missing == []
+
+
+def test_unit_cost_plan(start):
+    plan = plan_workstation_graph(start)
+    assert plan.total_work == 7
+    assert plan.critical_path_cost == 4
+    assert [len(level) for level in plan.levels] == [2, 2, 2, 1]
+    assert plan.max_parallelism == 2
+    assert 'critical path cost: 4.000' in plan.report()
+
+
+def test_critical_path_follows_costs(start):
+    plan = plan_workstation_graph(start, costs={'events': 10, 'network': 2})
+    assert plan.critical_path == [
+        'PathProcess/events_path',
+        'InputProcess/events',
+        'HandlerProcess/volume_counts:bus',
+        'PostProcess/vkt:bus',
+    ]
+    assert plan.critical_path_cost == 13
+    assert plan.total_work == 17
+
+
+def test_historical_costs(start):
+    with Profiler() as profiler:
+        operate_workstation_graph(start)
+    costs = profiler.tool_costs()
+    assert set(costs) == set(plan_workstation_graph(start, engage=False).nodes)
+
+    plan = plan_workstation_graph(start, costs=costs, default_cost=0, engage=False)
+    assert plan.total_work == pytest.approx(sum(costs.values()))
+
+
+def test_historical_costs_of_reused_workstation_classes():
+    s = StartProcess(config)
+    post, handler, inputs, paths = (WorkStation(config) for _ in range(4))
+    post.tools, handler.tools = PostProcess.tools, HandlerProcess.tools
+    inputs.tools, paths.tools = InputProcess.tools, PathProcess.tools
+    inputs.label = 'inputs'
+    s.connect(None, [handler, post])
+    post.connect([s], [handler])
+    handler.connect([s, post], [inputs])
+    inputs.connect([handler], [paths])
+    paths.connect([inputs], None)
+
+    with Profiler() as profiler:
+        operate_workstation_graph(s)
+    costs = profiler.tool_costs()
+    assert set(costs) == set(plan_workstation_graph(s, engage=False).nodes)
+    assert 'WorkStation[2]/vkt:bus' in costs and 'inputs/events' in costs
+    assert inputs.label == 'inputs' and post.label is None
+    assert len(costs) == len([r for r in profiler.records if r['category'] == 'tool'])
+
+
+def test_dry_run_matches_engaged_graph(start):
+    dry_run = dry_run_workstation_graph(start)
+    assert dry_run['missing'] == []
+    assert dry_run['invalid'] == []
+
+    for station in engage_workstation_graph(start):
+        assert set(dry_run['resources'][station]) == set(station.resources)
+        if station.suppliers:
+            assert equals(dry_run['requirements'][station], station.get_requirements())
+
+
+def test_dry_run_does_not_initiate_tools(start):
+
+    class ExpensiveEvents(Events):
+        def __init__(self, option=None):
+            raise AssertionError('tool initiated')
+
+    inputs = start.suppliers[0].suppliers[0]
+    inputs.tools = dict(inputs.tools, events=ExpensiveEvents)
+    dry_run = dry_run_workstation_graph(start)
+    assert dry_run['resources'][inputs] == {'events': ExpensiveEvents, 'network': Network}
+    assert inputs.resources == {}
+
+
+def test_dry_run_reports_problems(start):
+    handler = start.suppliers[0]
+    inputs = handler.suppliers[0]
+    inputs.tools = {'events': Events, 'plans': Plans}
+
+    class BadConfig(Config):
+        def get_requirements(self):
+            return {'volume_counts': ['car', 'rail']}
+
+    start.config = BadConfig()
+    dry_run = dry_run_workstation_graph(start)
+    assert dry_run['missing'] == [(handler, ['network'])]
+    assert [(station, key) for station, key, _ in dry_run['invalid']] == [
+        (handler, 'volume_counts:rail')
+    ]
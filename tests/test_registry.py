@@ -0,0 +1,163 @@
+import asyncio
+import sys
+import os
+import gc
+import threading
+import weakref
+import pytest
+
+sys.path.append(os.path.abspath('../factory'))
+from factory.factory import WorkStation, Tool, operate_workstation_graph
+from factory.factory import operate_workstation_graph_async
+from factory.registry import ResourceRegistry
+sys.path.append(os.path.abspath('../tests'))
+
+
+builds = []
+
+
+class Config:
+    def __init__(self, requirements):
+        self.requirements = requirements
+
+    def get_requirements(self):
+        return self.requirements
+
+
+class Source(Tool):
+    thread_safe = True
+
+    def build(self, resource):
+        super().build(resource)
+        builds.append(self)
+
+
+class OtherSource(Source):
+    pass
+
+
+class Load(Tool):
+    req = ['source']
+    thread_safe = True
+
+    def build(self, resource):
+        super().build(resource)
+        builds.append(self)
+
+
+class Station(WorkStation):
+    tools = None
+
+
+def graph(shared_source=True):
+    """
+    start requires a and b, from managers each with a 'load' tool, which require 'source' from a
+    shared supplier, or from separate suppliers of different sources.
+    """
+    start = Station(Config({'a': None, 'b': None}))
+    left, right = Station(None), Station(None)
+    left.tools = {'a': Load}
+    right.tools = {'b': Load}
+    start.connect(None, [left, right])
+    if shared_source:
+        source = Station(None)
+        source.tools = {'source': Source}
+        left.connect([start], [source])
+        right.connect([start], [source])
+        source.connect([left, right], None)
+    else:
+        sources = Station(None), Station(None)
+        for manager, source, tool in zip((left, right), sources, (Source, OtherSource)):
+            source.tools = {'source': tool}
+            manager.connect([start], [source])
+            source.connect([manager], None)
+    return start, left, right
+
+
+@pytest.mark.parametrize('executor', [None, 'thread', 'resource'])
+def test_equivalent_tools_are_built_once(executor):
+    builds.clear()
+    start, left, right = graph()
+    registry = ResourceRegistry()
+    operate_workstation_graph(start, executor=executor, registry=registry, lazy=True)
+
+    assert left.resources['a'] is right.resources['b']
+    assert len(builds) == 2
+    assert (registry.hits, registry.misses) == (1, 2)
+
+
+def test_registry_is_not_sent_to_worker_processes():
+    start, left, right = graph()
+    registry = ResourceRegistry()
+    operate_workstation_graph(start, executor='process', registry=registry)
+
+    assert isinstance(left.resources['a'], Load) and isinstance(right.resources['b'], Load)
+    assert left.resources['a'] is not right.resources['b']  # ie built in separate workers
+    assert (registry.hits, registry.misses) == (0, 0)
+
+
+class AsyncLoad(Load):
+
+    async def build(self, resource):
+        await asyncio.sleep(0.01)
+        builds.append(self)
+
+
+def test_equivalent_async_tools_are_built_once():
+    builds.clear()
+    start, loads, source = Station(Config({'p': None, 'q': None})), Station(None), Station(None)
+    loads.tools = {'p': AsyncLoad, 'q': AsyncLoad}
+    source.tools = {'source': Source}
+    start.connect(None, [loads])
+    loads.connect([start], [source])
+    source.connect([loads], None)
+    registry = ResourceRegistry()
+    asyncio.run(operate_workstation_graph_async(start, registry=registry))
+
+    assert loads.resources['p'] is loads.resources['q']
+    assert len(builds) == 2  # ie source and one of p and q
+    assert (registry.hits, registry.misses) == (1, 2)
+
+
+def test_tools_of_different_suppliers_are_not_shared():
+    builds.clear()
+    start, left, right = graph(shared_source=False)
+    registry = ResourceRegistry()
+    operate_workstation_graph(start, registry=registry)
+
+    assert left.resources['a'] is not right.resources['b']
+    assert len(builds) == 4
+    assert registry.hits == 0
+
+
+def test_concurrent_equivalent_builds_wait_for_first():
+    registry = ResourceRegistry()
+    started, release = threading.Event(), threading.Event()
+    results = []
+
+    def build():
+        started.set()
+        release.wait(timeout=5)
+        return Source()
+
+    first = threading.Thread(target=lambda: results.append(registry.share(Source(), {}, build)))
+    first.start()
+    started.wait(timeout=5)
+    second = threading.Thread(target=lambda: results.append(registry.share(Source(), {}, None)))
+    second.start()
+    release.set()
+    first.join()
+    second.join()
+    assert results[0] is results[1]
+    assert (registry.hits, registry.misses) == (1, 1)
+
+
+def test_registry_does_not_keep_released_resources():
+    registry = ResourceRegistry()
+    tool = registry.share(Source(), {}, Source)
+    reference = weakref.ref(tool)
+    assert len(registry) == 1
+    del tool
+    gc.collect()
+    assert reference() is None
+    assert len(registry) == 0
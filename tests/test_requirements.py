@@ -0,0 +1,54 @@
+import sys
+import os
+import pytest
+
+sys.path.append(os.path.abspath('../factory'))
+from factory.factory import combine_reqs, convert_to_unique_keys, equals
+from factory.requirements import RequirementSet, requirement_key, unique_key
+sys.path.append(os.path.abspath('../tests'))
+
+
+req1 = {'a': ['1', '2'], 'b': ['1']}
+req2 = {'b': ['2'], 'c': None}
+req3 = {'b': None, 'd': None}
+
+
+def test_keys_are_interned():
+    assert requirement_key('a', '1') is requirement_key('a', '1')
+    assert unique_key('a', str(1)) is unique_key('a', '1')
+    assert unique_key('a') == 'a'
+
+
+test_dict_data = [
+    ({}, {}),
+    (req1, req1),
+    (req2, req2),
+    ({'a': []}, {'a': None}),
+]
+
+
+@pytest.mark.parametrize("d,expected", test_dict_data)
+def test_dict_round_trip(d, expected):
+    assert equals(RequirementSet.from_dict(d).to_dict(), expected)
+
+
+test_union_data = [
+    ([], {}),
+    ([req1, req2], {'a': ['1', '2'], 'b': ['1', '2'], 'c': None}),
+    ([req2, req3], {'b': ['2'], 'c': None, 'd': None}),
+    ([None, req3], req3),
+]
+
+
+@pytest.mark.parametrize("reqs,expected", test_union_data)
+def test_union_matches_combine_reqs(reqs, expected):
+    assert equals(RequirementSet.union(reqs).to_dict(), expected)
+    assert equals(combine_reqs(reqs), expected)
+
+
+def test_merge_requirement_sets():
+    reqs = RequirementSet.from_dict(req1).update(RequirementSet.from_dict(req3))
+    assert len(reqs) == 5
+    assert ('a', '2') in reqs
+    assert reqs == {'a': ['1', '2'], 'b': ['1'], 'd': None}
+    assert sorted(reqs.unique_keys()) == sorted(convert_to_unique_keys(reqs.to_dict()))
@@ -1,10 +1,12 @@
 import sys
 import os
+import time
 import pytest
 
 sys.path.append(os.path.abspath('../factory'))
 from simple_example import *
 from factory.factory import combine_reqs, operate_workstation_graph, equals
+from factory.factory import engage_workstation_graph, build_workstation_graph
 sys.path.append(os.path.abspath('../tests'))
 
 
@@ -114,6 +116,53 @@ def test_bfs(start, b, c, d, end):
     assert sequence == [start, b, c, d, end, end, d, c, b, start]
 
 
+def test_staged_schedulers(start, b, c, d, end):
+    start.connect(None, [b, c])
+    b.connect([start], [d])
+    c.connect([start], [d])
+    d.connect([b, c], [end])
+    end.connect([d], None)
+
+    sequence = engage_workstation_graph(start)
+    assert sequence == [start, b, c, d, end]
+    assert build_workstation_graph(sequence) == [end, d, c, b, start]
+
+
+@pytest.mark.parametrize("executor", ['thread', 'process'])
+def test_concurrent_build(start, b, c, d, end, executor):
+    start.connect(None, [b, c])
+    b.connect([start], [d])
+    c.connect([start], [d])
+    d.connect([b, c], [end])
+    end.connect([d], None)
+
+    sequence = operate_workstation_graph(start, executor=executor, max_workers=2)
+    assert sequence[:5] == [start, b, c, d, end]
+    assert sequence[5:7] == [end, d]
+    assert set(sequence[7:9]) == {b, c}
+    assert sequence[9] == start
+    assert set(d.resources) == {'a:2', 'c:2', 'c:1', 'a:1', 'b:1', 'e:1'}
+    assert set(end.resources) == {'a:1', 'a:2', 'b:1', 'b:2', 'c:1', 'e:1', 'e:2', 'f:1', 'f:2'}
+
+
+def test_resource_executor_waits_for_workstations_built_whole(start, b, c, d):
+    class SlowEndProcess(EndProcess):
+        def build(self):
+            time.sleep(0.2)  # ie resources only exist once built
+            super().build()
+
+    end = SlowEndProcess(config)
+    start.connect(None, [b, c])
+    b.connect([start], [d])
+    c.connect([start], [d])
+    d.connect([b, c], [end])
+    end.connect([d], None)
+
+    sequence = operate_workstation_graph(start, executor='resource')
+    assert sequence[5] == end
+    assert set(d.resources) == {'a:2', 'c:2', 'c:1', 'a:1', 'b:1', 'e:1'}
+
+
 def test_engage_supply_chain(start, b, c, d, end):
     start.connect(None, [b, c])
     b.connect([start], [d])
@@ -0,0 +1,159 @@
+import sys
+import os
+import json
+import pytest
+
+sys.path.append(os.path.abspath('../factory'))
+from factory.factory import LazyTool, operate_workstation_graph
+from factory.spec import CompiledPlan, build_spec_graph, compile_spec, load_plan, load_spec
+from factory.spec import operate_compiled_plan
+sys.path.append(os.path.abspath('../tests'))
+
+
+SPEC = {
+    'start': 'start',
+    'requirements': {'volume_counts': ['car'], 'vkt': ['bus']},
+    'stations': {
+        'start': {'class': 'elara_example:StartProcess', 'suppliers': ['handler', 'post']},
+        'post': {'class': 'elara_example:PostProcess', 'suppliers': ['handler']},
+        'handler': {'class': 'elara_example:HandlerProcess', 'suppliers': ['inputs']},
+        'inputs': {'class': 'elara_example:InputProcess', 'suppliers': ['paths']},
+        'paths': {
+            'tools': {
+                'network_path': 'elara_example:GetPath',
+                'events_path': 'elara_example.GetPath',
+            },
+        },
+    },
+}
+
+YAML = """
+start: start
+requirements: {volume_counts: [car], vkt: [bus]}
+stations:
+  start: {class: 'elara_example:StartProcess', suppliers: [handler, post]}
+  post: {class: 'elara_example:PostProcess', suppliers: [handler]}
+  handler: {class: 'elara_example:HandlerProcess', suppliers: [inputs]}
+  inputs: {class: 'elara_example:InputProcess', suppliers: [paths]}
+  paths:
+    tools: {network_path: 'elara_example:GetPath', events_path: elara_example.GetPath}
+"""
+
+TOML = """
+start = "start"
+[requirements]
+volume_counts = ["car"]
+vkt = ["bus"]
+[stations.start]
+class = "elara_example:StartProcess"
+suppliers = ["handler", "post"]
+[stations.post]
+class = "elara_example:PostProcess"
+suppliers = ["handler"]
+[stations.handler]
+class = "elara_example:HandlerProcess"
+suppliers = ["inputs"]
+[stations.inputs]
+class = "elara_example:InputProcess"
+suppliers = ["paths"]
+[stations.paths.tools]
+network_path = "elara_example:GetPath"
+events_path = "elara_example.GetPath"
+"""
+
+
+@pytest.mark.parametrize('name,text', [
+    ('spec.json', json.dumps(SPEC)),
+    ('spec.yaml', YAML),
+    ('spec.toml', TOML),
+])
+def test_load_spec_formats(tmp_path, name, text):
+    if name.endswith('.yaml'):
+        pytest.importorskip('yaml')
+    path = tmp_path / name
+    path.write_text(text)
+    assert load_spec(str(path)) == SPEC
+
+
+def test_build_spec_graph_derives_managers():
+    start, stations = build_spec_graph(SPEC)
+    assert start is stations['start']
+    assert stations['handler'].managers == [stations['start'], stations['post']]
+    assert stations['paths'].suppliers is None
+
+
+def test_unknown_supplier():
+    spec = json.loads(json.dumps(SPEC))
+    spec['stations']['post']['suppliers'] = ['missing']
+    with pytest.raises(ValueError, match='Unknown supplier: missing'):
+        build_spec_graph(spec)
+
+
+def test_compiled_plan_matches_operated_graph():
+    start, stations = build_spec_graph(SPEC)
+    operate_workstation_graph(start)
+
+    plan = compile_spec(SPEC)
+    assert plan.order == ('start', 'post', 'handler', 'inputs', 'paths')
+    assert dict(plan.depths) == {name: station.depth for name, station in stations.items()}
+    for name, station in stations.items():
+        assert plan.resource_keys[name] == tuple(station.resources)
+
+    sequence = operate_compiled_plan(plan)
+    built = {type(station).__name__: station for station in sequence}
+    for name, station in stations.items():
+        resources = built[type(station).__name__].resources
+        assert set(resources) == set(station.resources)
+        assert not any(isinstance(tool, LazyTool) for tool in resources.values())
+
+
+def test_plan_round_trip_is_immutable(tmp_path):
+    plan = compile_spec(SPEC)
+    plan.save(str(tmp_path / 'plan.json'))
+    loaded = CompiledPlan.load(str(tmp_path / 'plan.json'))
+    assert loaded.to_dict() == plan.to_dict()
+    with pytest.raises(TypeError):
+        loaded.depths['start'] = 3
+
+    start, sequence = loaded.instantiate()
+    assert [station.requirements_cached for station in sequence] == [True] * 5
+    assert isinstance(sequence[-1].resources['network_path'], LazyTool)
+
+
+def test_load_plan_reuses_matching_plan(tmp_path, monkeypatch):
+    spec_path = tmp_path / 'spec.json'
+    spec_path.write_text(json.dumps(SPEC))
+    plan = load_plan(str(spec_path))
+    assert os.path.exists(str(spec_path) + '.plan.json')
+
+    compiled = []
+    monkeypatch.setattr('factory.spec.compile_spec', lambda spec: compiled.append(spec))
+    assert load_plan(str(spec_path)).to_dict() == plan.to_dict()
+    assert not compiled
+
+    spec = json.loads(json.dumps(SPEC))
+    spec['requirements'] = {'vkt': ['car']}
+    spec_path.write_text(json.dumps(spec))
+    monkeypatch.undo()
+    assert load_plan(str(spec_path)).fingerprint != plan.fingerprint
+
+
+def test_instantiated_plan_resolves_tools_when_built(tmp_path, monkeypatch):
+    (tmp_path / 'spec_tools.py').write_text(
+        'from factory.factory import Tool\n\n\nclass Source(Tool):\n    pass\n'
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+    spec = {
+        'start': 'start',
+        'requirements': {'source': None},
+        'stations': {
+            'start': {'suppliers': ['inputs']},
+            'inputs': {'tools': {'source': 'spec_tools:Source'}},
+        },
+    }
+    plan = compile_spec(spec)
+
+    start, sequence = plan.instantiate()
+    assert sequence[-1].resources['source']._tool_class == 'spec_tools:Source'
+    sequence = operate_compiled_plan(plan)
+    assert type(sequence[1].resources['source']).__name__ == 'Source'
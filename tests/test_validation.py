@@ -0,0 +1,84 @@
+import sys
+import os
+import pytest
+
+sys.path.append(os.path.abspath('../factory'))
+from factory.factory import WorkStation, build_graph_depth, find_cycle
+from factory.validation import validate_workstation_graph
+sys.path.append(os.path.abspath('../tests'))
+
+
+class Start(WorkStation):
+    tools = None
+
+
+class Station(WorkStation):
+    tools = None
+
+
+def diamond():
+    start, b, c, d = Start(None), Station(None), Station(None), Station(None)
+    start.connect(None, [b, c])
+    b.connect([start], [d])
+    c.connect([start], [d])
+    d.connect([b, c], None)
+    return start, b, c, d
+
+
+def test_valid_graph_has_no_problems():
+    start, b, c, d = diamond()
+    assert validate_workstation_graph(start) == []
+    assert find_cycle(start) is None
+
+
+def test_cycle_is_reported_with_path():
+    start, b, c, d = diamond()
+    d.connect([b, c], [b])
+    b.connect([start, d], [d])
+    assert find_cycle(start) == [b, d, b]
+    with pytest.raises(ValueError, match=r'Station\[1\] -> Station\[3\] -> Station\[1\]'):
+        validate_workstation_graph(start)
+    with pytest.raises(ValueError, match='Circular dependency between workstations: '
+                                         'Station -> Station -> Station'):
+        build_graph_depth(start)
+
+
+def test_connect_validate_rejects_cycle():
+    start, b, c, d = diamond()
+    with pytest.raises(ValueError, match='Circular dependency'):
+        d.connect([b], [start], validate=True)
+    assert d.managers == [b, c] and d.suppliers is None
+    d.connect([b, c], [], validate=True)
+
+
+def test_asymmetric_connections_are_reported():
+    start, b, c, d = diamond()
+    d.connect([b], None)
+    problems = validate_workstation_graph(start, raise_errors=False)
+    assert problems == [
+        'Asymmetric connection: Station[3] is a supplier of Station[2] but does not list it as '
+        'a manager (at Start -> Station[1] -> Station[3]).'
+    ]
+
+
+def test_unreachable_workstations_are_reported():
+    start, b, c, d = diamond()
+    orphan = Station(None)
+    d.connect((b, c, orphan), None)  # ie connections of mixed sequence types
+    orphan.connect(None, [d])
+    problems = validate_workstation_graph(start, raise_errors=False)
+    assert problems == [
+        'Unreachable workstation: Station[4] is connected to Station[3] '
+        '(at Start -> Station[1] -> Station[3]) but does not supply Start.'
+    ]
+
+
+def test_deep_graphs_are_validated_without_recursion():
+    stations = [Station(None) for _ in range(sys.getrecursionlimit() * 2)]
+    for i, station in enumerate(stations):
+        managers = [stations[i - 1]] if i else None
+        suppliers = [stations[i + 1]] if i + 1 < len(stations) else None
+        station.connect(managers, suppliers)
+    assert validate_workstation_graph(stations[0]) == []
+    stations[-1].connect([stations[-2]], [stations[0]])
+    assert len(find_cycle(stations[0])) == len(stations) + 1